@@ -1 +1,11 @@
 # This file makes the 'agents' directory a Python package.
+#
+# Only the real agent implementations are exported here. IngestionAgent,
+# StrategyAgent and the NotifyWorker are imported from their own modules.
+from .base import Agent
+from .execution import ExecutionAgent
+from .kpi import KpiAgent
+from .report import ReportAgent
+from .risk import RiskAgent
+
+__all__ = ["Agent", "ExecutionAgent", "KpiAgent", "ReportAgent", "RiskAgent"]
@@ -4,11 +4,14 @@ orders and submitting them to the database, ensuring idempotency and correctness
 """
 import logging
 import hashlib
+import struct
+import time
 from datetime import datetime, timezone
 
 # Assuming the use of psycopg, as it's a common choice mentioned in docs
 import psycopg
 
+from ..log_config import LazyJson
 from ..models import TradingDecision, TradeSide
 from ..services.system import get_system_configuration
 from .base import Agent
@@ -38,57 +41,118 @@ class ExecutionAgent(Agent):
         self.db = db_connection
         self.account_id = account_id
         self.logger = logging.getLogger(self.__class__.__name__)
+        # SHA256 states pre-fed with the parts of the idempotency key that rarely
+        # change (account, then account + minute); each key copies the latter.
+        self._key_base = hashlib.sha256(str(account_id).encode() + b"\x1f")
+        self._key_minute: int | None = None
+        self._key_minute_base = self._key_base.copy()
 
     def run(self, decision: TradingDecision):
         """
         The main entry point for the agent's logic.
         This method will be called by the scheduler with a trading decision.
         """
-        self.logger.info(f"Received decision: {decision.model_dump_json()}")
+        self.logger.info("Received decision: %s", LazyJson(decision))
         self._execute_decision(decision)
 
-    def _generate_idempotency_key(self, decision: TradingDecision) -> str:
-        """
-        Generates a deterministic idempotency key from a trading decision using SHA256.
+    def run_many(self, decisions: list[TradingDecision]) -> list[int]:
         """
-        # Using a rounded timestamp to create a time-window for idempotency
-        # e.g., allowing a new, identical signal after 5 minutes.
-        ts = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M")
+        Executes a batch of trading decisions with a single multi-row INSERT.
 
-        key_data = (
-            f"{self.account_id}-{decision.symbol}-{decision.side.value}-"
-            f"{decision.stop_loss}-{decision.take_profit}-{ts}"
-        )
+        Decisions that resolve to no known instrument, or whose idempotency key
+        already belongs to an active order, are skipped by the database.
 
-        # Create a SHA256 hash of the key data for a uniform, fixed-length key
-        return hashlib.sha256(key_data.encode("utf-8")).hexdigest()
+        Args:
+            decisions: The trading decisions to execute.
 
-    def _get_exchange_instrument_id(self, symbol: str) -> int | None:
+        Returns:
+            The IDs of the newly inserted orders.
         """
-        Fetches the exchange_instrument_id from the database for a given symbol.
-        """
-        # This query robustly handles both generic symbols (e.g., 'BTC/USD') and
-        # exchange-specific symbols (e.g., 'BTCUSD').
-        query = """
-        SELECT ei.id
-        FROM exchange_instruments ei
-        LEFT JOIN instruments i ON ei.instrument_id = i.id
-        WHERE i.symbol = %s OR ei.exchange_symbol = %s;
+        if not decisions:
+            return []
+
+        self.logger.info("Received batch of %d decisions.", len(decisions))
+
+        # --- M10 Guardrail: Kill Switch Check ---
+        system_config = get_system_configuration(self.db)
+        if not system_config or not system_config.is_trading_enabled:
+            self.logger.warning(
+                "Trading is disabled (kill switch is ON or system config is missing). "
+                "Discarding %d decisions.",
+                len(decisions),
+            )
+            return []
+
+        params = {
+            "account_id": self.account_id,
+            "symbols": [d.symbol for d in decisions],
+            "keys": [self._generate_idempotency_key(d) for d in decisions],
+            "sides": [d.side.value for d in decisions],
+            "quantities": [d.quantity if d.quantity is not None else 0.01 for d in decisions],
+        }
+
+        sql = """
+        INSERT INTO orders (account_id, exchange_instrument_id, idempotency_key, side, type, status, quantity)
+        SELECT %(account_id)s, ei.id, d.idempotency_key, d.side::order_side,
+               'market'::order_type, 'NEW'::order_status, d.quantity
+        FROM unnest(%(symbols)s::text[], %(keys)s::text[], %(sides)s::text[], %(quantities)s::numeric[])
+             AS d(symbol, idempotency_key, side, quantity)
+        CROSS JOIN LATERAL (
+            SELECT ei.id
+            FROM exchange_instruments ei
+            LEFT JOIN instruments i ON ei.instrument_id = i.id
+            WHERE i.symbol = d.symbol OR ei.exchange_symbol = d.symbol
+            ORDER BY ei.id
+            LIMIT 1
+        ) ei
+        ON CONFLICT (account_id, idempotency_key) WHERE status IN ('NEW', 'PARTIALLY_FILLED') DO NOTHING
+        RETURNING id;
         """
+
         try:
             with self.db.cursor() as cursor:
-                # Pass the symbol for both WHERE clause conditions
-                cursor.execute(query, (symbol, symbol))
-                result = cursor.fetchone()
-                if result:
-                    self.logger.info(f"Found exchange_instrument_id: {result[0]} for symbol {symbol}")
-                    return result[0]
-                else:
-                    self.logger.error(f"No exchange_instrument found for symbol: {symbol}")
-                    return None
+                cursor.execute(sql, params, prepare=True)
+                order_ids = [row[0] for row in cursor.fetchall()]
+                self.db.commit()
+        except psycopg.errors.RaiseException as e:
+            # This is likely from our trg_orders_normalize trigger
+            self.logger.error("Order batch rejected by database trigger: %s", e)
+            self.db.rollback()
+            return []
         except psycopg.Error as e:
-            self.logger.error(f"Database error while fetching instrument ID for {symbol}: {e}")
-            return None
+            self.logger.critical("An unexpected database error occurred: %s", e)
+            self.db.rollback()
+            return []
+
+        skipped = len(decisions) - len(order_ids)
+        self.logger.info(
+            "Inserted %d orders from batch (%d skipped as duplicate or unknown).", len(order_ids), skipped
+        )
+        return order_ids
+
+    def _generate_idempotency_key(self, decision: TradingDecision) -> str:
+        """
+        Generates a deterministic idempotency key from a trading decision using SHA256.
+        """
+        # Using a rounded timestamp to create a time-window for idempotency
+        # e.g., allowing a new, identical signal after 5 minutes.
+        # The minute-prefixed hash state is rebuilt only when the minute rolls over.
+        minute = int(time.time() // 60)
+        if minute != self._key_minute:
+            self._key_minute = minute
+            self._key_minute_base = self._key_base.copy()
+            self._key_minute_base.update(
+                datetime.fromtimestamp(minute * 60, timezone.utc).strftime("%Y-%m-%d %H:%M").encode() + b"\x1f"
+            )
+
+        # Only the decision-specific suffix is hashed per call.
+        key_hash = self._key_minute_base.copy()
+        key_hash.update(b"\x1f".join((
+            decision.symbol.encode(),
+            decision.side.value.encode(),
+            struct.pack("<dd", decision.stop_loss or 0.0, decision.take_profit or 0.0),
+        )))
+        return key_hash.hexdigest()
 
     def _execute_decision(self, decision: TradingDecision) -> int | None:
         """
@@ -100,67 +164,78 @@ class ExecutionAgent(Agent):
         if not system_config or not system_config.is_trading_enabled:
             self.logger.warning(
                 "Trading is disabled (kill switch is ON or system config is missing). "
-                f"Discarding decision: {decision.model_dump_json()}"
+                "Discarding decision: %s",
+                LazyJson(decision),
             )
             return None
 
         idempotency_key = self._generate_idempotency_key(decision)
-        self.logger.info(f"Generated idempotency key: {idempotency_key}")
-
-        exchange_instrument_id = self._get_exchange_instrument_id(decision.symbol)
-        if exchange_instrument_id is None:
-            return None # Error already logged in the helper method
+        self.logger.info("Generated idempotency key: %s", idempotency_key)
 
         # We assume a 'market' order for now, as it's not in TradingDecision.
-        # Price is NULL for market orders.
+        # Price is left NULL for market orders.
         # Use quantity from the decision if provided, otherwise use the placeholder default.
         quantity_to_use = decision.quantity if decision.quantity is not None else 0.01
 
         order_to_insert = {
             "account_id": self.account_id,
-            "exchange_instrument_id": exchange_instrument_id,
+            "symbol": decision.symbol,
             "idempotency_key": idempotency_key,
             "side": decision.side.value,
-            "type": "market",
-            "status": "NEW",
             "quantity": quantity_to_use,
-            "price": None, # Market orders don't have a price
         }
 
         # The DB trigger will normalize quantity and check min_notional.
-        # Let's assume a placeholder quantity that is likely to be valid.
         # In a real system, the StrategyAgent would suggest a quantity.
 
+        # The exchange_instrument_id is resolved inline, matching both generic
+        # symbols (e.g., 'BTC/USD') and exchange-specific ones (e.g., 'BTCUSD'),
+        # so no separate lookup round trip is needed. An unknown symbol simply
+        # inserts nothing and RETURNING yields no row.
         sql = """
-        INSERT INTO orders (account_id, exchange_instrument_id, idempotency_key, side, type, status, quantity, price)
-        VALUES (%(account_id)s, %(exchange_instrument_id)s, %(idempotency_key)s, %(side)s, %(type)s, %(status)s, %(quantity)s, %(price)s)
+        INSERT INTO orders (account_id, exchange_instrument_id, idempotency_key, side, type, status, quantity)
+        SELECT %(account_id)s, ei.id, %(idempotency_key)s, %(side)s::order_side,
+               'market'::order_type, 'NEW'::order_status, %(quantity)s
+        FROM exchange_instruments ei
+        LEFT JOIN instruments i ON ei.instrument_id = i.id
+        WHERE i.symbol = %(symbol)s OR ei.exchange_symbol = %(symbol)s
+        ORDER BY ei.id
+        LIMIT 1
         RETURNING id;
         """
 
         try:
             with self.db.cursor() as cursor:
-                cursor.execute(sql, order_to_insert)
-                order_id = cursor.fetchone()[0]
+                cursor.execute(sql, order_to_insert, prepare=True)
+                result = cursor.fetchone()
+                if result is None:
+                    self.logger.error("No exchange_instrument found for symbol: %s", decision.symbol)
+                    self.db.rollback()
+                    return None
+                order_id = result[0]
                 self.db.commit()
-                self.logger.info(f"Successfully inserted order with ID: {order_id} and idempotency_key: {idempotency_key}")
+                self.logger.info(
+                    "Successfully inserted order with ID: %s and idempotency_key: %s", order_id, idempotency_key
+                )
                 self.logger.info("TODO: Submit order to the exchange via CCXT.")
                 return order_id
 
         except psycopg.errors.UniqueViolation:
             self.logger.warning(
-                f"Duplicate order detected with idempotency_key: {idempotency_key}. "
-                "The order has already been processed. Suppressing."
+                "Duplicate order detected with idempotency_key: %s. "
+                "The order has already been processed. Suppressing.",
+                idempotency_key,
             )
             self.db.rollback()
             return None
 
         except psycopg.errors.RaiseException as e:
             # This is likely from our trg_orders_normalize trigger
-            self.logger.error(f"Order rejected by database trigger: {e}")
+            self.logger.error("Order rejected by database trigger: %s", e)
             self.db.rollback()
             return None
 
         except psycopg.Error as e:
-            self.logger.critical(f"An unexpected database error occurred: {e}")
+            self.logger.critical("An unexpected database error occurred: %s", e)
             self.db.rollback()
             return None
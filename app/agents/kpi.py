@@ -9,6 +9,15 @@ from app.kpi.services import calculate_all_kpis
 
 logger = logging.getLogger(__name__)
 
+INSERT_KPI_SNAPSHOT_SQL = """
+    INSERT INTO ops_kpi_snapshots (
+        ts, order_latency_p50_ms, order_latency_p95_ms,
+        order_failure_rate, order_retry_rate,
+        position_gross_exposure_usd, open_positions_count
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (ts) DO NOTHING;
+"""
+
 class KpiAgent(Agent):
     """
     This agent periodically calculates operational KPIs and saves them to the
@@ -38,16 +47,9 @@ class KpiAgent(Agent):
 
             # 2. Save the snapshot to the database
             with self.db_connection.cursor() as cursor:
-                insert_query = """
-                    INSERT INTO ops_kpi_snapshots (
-                        ts, order_latency_p50_ms, order_latency_p95_ms,
-                        order_failure_rate, order_retry_rate,
-                        position_gross_exposure_usd, open_positions_count
-                    ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (ts) DO NOTHING;
-                """
+                # Prepared server-side, so repeated runs skip parse/plan.
                 cursor.execute(
-                    insert_query,
+                    INSERT_KPI_SNAPSHOT_SQL,
                     (
                         kpi_snapshot.ts,
                         kpi_snapshot.order_latency_p50_ms,
@@ -57,11 +59,12 @@ class KpiAgent(Agent):
                         kpi_snapshot.position_gross_exposure_usd,
                         kpi_snapshot.open_positions_count,
                     ),
+                    prepare=True,
                 )
                 self.db_connection.commit()
-                self.logger.info(f"Successfully saved KPI snapshot for ts: {kpi_snapshot.ts}")
+                self.logger.info("Successfully saved KPI snapshot for ts: %s", kpi_snapshot.ts)
 
         except Exception as e:
-            self.logger.error(f"An error occurred during KPI processing: {e}", exc_info=True)
+            self.logger.error("An error occurred during KPI processing: %s", e, exc_info=True)
             # In a real app, you might want to rollback the transaction
             self.db_connection.rollback()
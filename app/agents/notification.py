@@ -1,15 +1,15 @@
 """
 The notification worker agent.
 """
+import asyncio
 import logging
 import time
-from datetime import datetime, timedelta
 
 import psycopg
 import telegram
 from pydantic import ValidationError
 
-from app.config import settings
+from app.config import get_settings
 
 logger = logging.getLogger(__name__)
 
@@ -29,18 +29,19 @@ class NotifyWorker:
             db_connection: A psycopg3 database connection.
         """
         self.db_connection = db_connection
+        settings = get_settings()
         if not settings.telegram_bot_token:
             raise ValueError("TELEGRAM_BOT_TOKEN is not set in the environment.")
 
         try:
             self.bot = telegram.Bot(token=settings.telegram_bot_token)
         except ValidationError as e:
-            logger.error(f"Error initializing Telegram Bot: {e}")
+            logger.error("Error initializing Telegram Bot: %s", e)
             raise
 
     def _get_pending_notifications(self, cursor: psycopg.Cursor):
         """
-        Fetches a batch of pending notifications from the outbox.
+        Claims a batch of pending notifications from the outbox.
 
         This query is the core of the worker. It does the following:
         - Selects notifications that are 'PENDING'.
@@ -49,73 +50,117 @@ class NotifyWorker:
           and the message severity meets the chat's minimum threshold.
         - Uses `FOR UPDATE SKIP LOCKED` to ensure that multiple worker
           instances don't pick up the same job.
+        - Marks the picked rows as 'SENDING' in the same statement, so the
+          claim is a single round-trip and other workers skip these rows.
         """
         query = """
-            SELECT
-                n.id, n.chat_id, n.title, n.message, n.fail_count
-            FROM notification_outbox n
-            JOIN telegram_chats tc ON n.chat_id = tc.chat_id
-            WHERE
-                n.status = 'PENDING'
-                AND (n.send_after IS NULL OR n.send_after <= NOW())
-                AND tc.enabled = TRUE
-                AND n.severity >= tc.min_severity
-            ORDER BY n.created_at
-            LIMIT 10
-            FOR UPDATE OF n SKIP LOCKED;
+            WITH picked AS (
+                SELECT n.id
+                FROM notification_outbox n
+                JOIN telegram_chats tc ON n.chat_id = tc.chat_id
+                WHERE
+                    n.status = 'PENDING'
+                    AND (n.send_after IS NULL OR n.send_after <= NOW())
+                    AND tc.enabled = TRUE
+                    AND n.severity >= tc.min_severity
+                ORDER BY n.created_at
+                LIMIT 10
+                FOR UPDATE OF n SKIP LOCKED
+            )
+            UPDATE notification_outbox n
+            SET status = 'SENDING'
+            FROM picked
+            WHERE n.id = picked.id
+            RETURNING n.id, n.chat_id, n.title, n.message, n.fail_count;
         """
         cursor.execute(query)
         return cursor.fetchall()
 
-    def _send_message(self, chat_id: int, title: str, message: str) -> bool:
+    async def _send_message(self, chat_id: int, title: str, message: str) -> bool:
         """Sends a message using the Telegram bot."""
         try:
             full_message = f"*{title}*\n\n{message}"
-            # In a real application, we would use asyncio for non-blocking calls.
-            # For this simplified agent, a synchronous call is acceptable.
-            self.bot.send_message(
+            await self.bot.send_message(
                 chat_id=chat_id,
                 text=full_message,
                 parse_mode=telegram.constants.ParseMode.MARKDOWN_V2
             )
-            logger.info(f"Successfully sent notification to chat_id {chat_id}")
+            logger.info("Successfully sent notification to chat_id %s", chat_id)
             return True
         except telegram.error.TelegramError as e:
-            logger.error(f"Failed to send notification to chat_id {chat_id}: {e}")
+            logger.error("Failed to send notification to chat_id %s: %s", chat_id, e)
             return False
         except Exception as e:
-            logger.error(f"An unexpected error occurred while sending message to {chat_id}: {e}")
+            logger.error("An unexpected error occurred while sending message to %s: %s", chat_id, e)
             return False
 
-    def _update_notification_status(self, cursor: psycopg.Cursor, notification_id: int, success: bool):
-        """Updates the notification status based on the send outcome."""
+    async def _send_batch(self, notifications) -> list[bool]:
+        """
+        Sends a batch of notifications concurrently.
+
+        Returns the send outcome for each notification, in input order.
+        """
+        async with self.bot:
+            results = await asyncio.gather(
+                *(
+                    self._send_message(chat_id, title, message)
+                    for _, chat_id, title, message, _ in notifications
+                ),
+                return_exceptions=True,
+            )
+        return [result is True for result in results]
+
+    def _update_notification_status(
+        self, cursor: psycopg.Cursor, notification_id: int, success: bool
+    ) -> psycopg.Cursor | None:
+        """
+        Updates the notification status based on the send outcome.
+
+        On failure, the retry/backoff decision is made by the database in the
+        same UPDATE (reading `fail_count` under the row lock), so no prior
+        SELECT is needed and the statement can be pipelined. The UPDATE runs
+        on its own cursor, which is returned so that the outcome can be read
+        with `_log_failure` once the pipeline has been synced.
+        """
         if success:
             query = "UPDATE notification_outbox SET status = 'SENT', sent_at = NOW() WHERE id = %s;"
             cursor.execute(query, (notification_id,))
+            return None
+
+        query = """
+            UPDATE notification_outbox
+            SET
+                status = CASE WHEN fail_count + 1 >= %(max_retries)s THEN 'FAILED' ELSE 'PENDING' END,
+                fail_count = fail_count + 1,
+                send_after = CASE
+                    WHEN fail_count + 1 >= %(max_retries)s THEN NULL
+                    -- Integer doubling; the exponent is capped so the shift cannot overflow.
+                    ELSE NOW() + %(base_backoff)s * (1 << LEAST(fail_count, 20)) * INTERVAL '1 second'
+                END
+            WHERE id = %(id)s
+            RETURNING status, send_after;
+        """
+        failure_cursor = cursor.connection.cursor()
+        failure_cursor.execute(
+            query,
+            {
+                "max_retries": self.MAX_RETRIES,
+                "base_backoff": self.BASE_BACKOFF_SECONDS,
+                "id": notification_id,
+            },
+        )
+        return failure_cursor
+
+    def _log_failure(self, failure_cursor: psycopg.Cursor, notification_id: int):
+        """Logs the outcome of a failed notification's status update."""
+        with failure_cursor:
+            row = failure_cursor.fetchone()
+        if row is None:
+            logger.error("Notification %s failed and could not be rescheduled: not found.", notification_id)
+        elif row[0] == 'FAILED':
+            logger.warning("Notification %s has reached max retries. Marking as FAILED.", notification_id)
         else:
-            # Get current fail_count first
-            cursor.execute("SELECT fail_count FROM notification_outbox WHERE id = %s;", (notification_id,))
-            fail_count = cursor.fetchone()[0]
-
-            if fail_count + 1 >= self.MAX_RETRIES:
-                status = 'FAILED'
-                send_after = None
-                logger.warning(f"Notification {notification_id} has reached max retries. Marking as FAILED.")
-            else:
-                status = 'PENDING'
-                backoff_delay = self.BASE_BACKOFF_SECONDS * (2 ** fail_count)
-                send_after = datetime.now() + timedelta(seconds=backoff_delay)
-                logger.info(f"Notification {notification_id} failed. Retrying after {send_after}.")
-
-            query = """
-                UPDATE notification_outbox
-                SET
-                    status = %s,
-                    fail_count = fail_count + 1,
-                    send_after = %s
-                WHERE id = %s;
-            """
-            cursor.execute(query, (status, send_after, notification_id))
+            logger.info("Notification %s failed. Retrying after %s.", notification_id, row[1])
 
     def run(self):
         """The main loop of the worker."""
@@ -128,14 +173,22 @@ class NotifyWorker:
                     if not notifications:
                         return
 
-                    logger.info(f"Found {len(notifications)} pending notifications to send.")
+                    logger.info("Found %d pending notifications to send.", len(notifications))
+
+                    outcomes = asyncio.run(self._send_batch(notifications))
 
-                    for notif in notifications:
-                        notif_id, chat_id, title, message, _ = notif
-                        success = self._send_message(chat_id, title, message)
-                        self._update_notification_status(cursor, notif_id, success)
+                    # Pipeline the status updates so they are flushed together
+                    # instead of waiting for one round-trip per notification.
+                    failures = []
+                    with cursor.connection.pipeline():
+                        for notif, success in zip(notifications, outcomes):
+                            failure_cursor = self._update_notification_status(cursor, notif[0], success)
+                            if failure_cursor is not None:
+                                failures.append((failure_cursor, notif[0]))
+                    for failure_cursor, notification_id in failures:
+                        self._log_failure(failure_cursor, notification_id)
         except psycopg.Error as e:
-            logger.error(f"Database error in NotifyWorker: {e}")
+            logger.error("Database error in NotifyWorker: %s", e)
             # The transaction will be rolled back automatically by the 'with' statement context manager
         except Exception as e:
-            logger.error(f"An unexpected error occurred in NotifyWorker: {e}")
+            logger.error("An unexpected error occurred in NotifyWorker: %s", e)
@@ -1,6 +1,7 @@
 """
 Agent responsible for generating and sending performance reports.
 """
+import hashlib
 import logging
 import psycopg
 from datetime import datetime
@@ -13,6 +14,20 @@ logger = logging.getLogger(__name__)
 # In a real application, this would come from a config or user settings in the DB
 DEFAULT_REPORT_CHAT_ID = -1001234567890 # Placeholder Channel ID
 
+# The full report layout, filled in one pass by ReportAgent._format_report.
+_REPORT_TMPL = (
+    "📊 *Operational Report* ({ts})\n"
+    "---------------------------\n"
+    "🚀 **Execution**\n"
+    "  - P50 Latency: {p50} ms\n"
+    "  - P95 Latency: {p95} ms\n"
+    "  - Failure Rate: {fail:.2%}\n"
+    "\n"
+    "💼 **Portfolio**\n"
+    "  - Open Positions: {pos}\n"
+    "  - Gross Exposure: ${expo:,.2f} USD"
+)
+
 class ReportAgent(Agent):
     """
     This agent generates a summary report based on the latest KPI snapshot
@@ -45,10 +60,15 @@ class ReportAgent(Agent):
                 return
 
             report_message = self._format_report(snapshot)
+            if not self._record_report_hash(report_message):
+                self.logger.info("Report is unchanged since the last one sent. Skipping.")
+                self.db_connection.rollback()
+                return
+
             self._enqueue_report(report_message)
 
         except Exception as e:
-            self.logger.error(f"An error occurred during report generation: {e}", exc_info=True)
+            self.logger.error("An error occurred during report generation: %s", e, exc_info=True)
 
     def _fetch_latest_kpi_snapshot(self) -> OpsKpiSnapshot | None:
         """Fetches the most recent KPI snapshot from the database."""
@@ -56,16 +76,18 @@ class ReportAgent(Agent):
         with self.db_connection.cursor() as cursor:
             cursor.execute("""
                 SELECT ts, order_latency_p50_ms, order_latency_p95_ms,
-                       order_failure_rate, order_retry_rate,
-                       position_gross_exposure_usd, open_positions_count
+                       order_failure_rate::float8, order_retry_rate::float8,
+                       position_gross_exposure_usd::float8, open_positions_count
                 FROM ops_kpi_snapshots
                 ORDER BY ts DESC
                 LIMIT 1;
-            """)
+            """, prepare=True)
             row = cursor.fetchone()
             if row:
-                self.logger.info(f"Found KPI snapshot from: {row[0]}")
-                return OpsKpiSnapshot(
+                self.logger.info("Found KPI snapshot from: %s", row[0])
+                # The row is typed by the table (numerics are cast to float8 in
+                # the query), so pydantic validation is skipped.
+                return OpsKpiSnapshot.model_construct(
                     ts=row[0],
                     order_latency_p50_ms=row[1],
                     order_latency_p95_ms=row[2],
@@ -79,25 +101,46 @@ class ReportAgent(Agent):
     def _format_report(self, snapshot: OpsKpiSnapshot) -> str:
         """Formats the KPI data into a human-readable string."""
         self.logger.info("Formatting KPI report...")
-        report_lines = [
-            f"📊 *Operational Report* ({snapshot.ts.strftime('%Y-%m-%d %H:%M Z')})",
-            "---------------------------",
-            f"🚀 **Execution**",
-            f"  - P50 Latency: {snapshot.order_latency_p50_ms} ms",
-            f"  - P95 Latency: {snapshot.order_latency_p95_ms} ms",
-            f"  - Failure Rate: {snapshot.order_failure_rate:.2%}",
-            "",
-            f"💼 **Portfolio**",
-            f"  - Open Positions: {snapshot.open_positions_count}",
-            f"  - Gross Exposure: ${snapshot.position_gross_exposure_usd:,.2f} USD",
-        ]
-        return "\n".join(report_lines)
+        return _REPORT_TMPL.format(
+            ts=snapshot.ts.strftime('%Y-%m-%d %H:%M Z'),
+            p50=snapshot.order_latency_p50_ms,
+            p95=snapshot.order_latency_p95_ms,
+            fail=snapshot.order_failure_rate,
+            pos=snapshot.open_positions_count,
+            expo=snapshot.position_gross_exposure_usd,
+        )
+
+    def _record_report_hash(self, message: str) -> bool:
+        """
+        Stores the hash of the report for the target chat if it differs from
+        the last one recorded.
+
+        The write is committed together with the enqueued notification.
+
+        Returns:
+            True if the report is new or changed, False if it is identical to
+            the last report sent.
+        """
+        report_hash = hashlib.sha256(message.encode()).digest()
+        with self.db_connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO report_state (chat_id, last_hash)
+                VALUES (%s, %s)
+                ON CONFLICT (chat_id) DO UPDATE
+                SET last_hash = EXCLUDED.last_hash, updated_at = NOW()
+                WHERE report_state.last_hash IS DISTINCT FROM EXCLUDED.last_hash
+                RETURNING 1;
+                """,
+                (DEFAULT_REPORT_CHAT_ID, report_hash),
+            )
+            return cursor.fetchone() is not None
 
     def _enqueue_report(self, message: str):
         """
         Enqueues the report message in the notification outbox.
         """
-        self.logger.info(f"Enqueuing report for chat_id: {DEFAULT_REPORT_CHAT_ID}")
+        self.logger.info("Enqueuing report for chat_id: %s", DEFAULT_REPORT_CHAT_ID)
         with self.db_connection.cursor() as cursor:
             # Use the enqueue_notification function in the DB
             cursor.execute(
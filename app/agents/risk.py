@@ -3,18 +3,117 @@ The RiskAgent is responsible for monitoring active positions and applying
 risk management rules, such as trailing stops or partial profit taking.
 """
 import logging
+import numpy as np
 import psycopg
+from dataclasses import dataclass, field
 from decimal import Decimal
 from datetime import datetime, timezone
 
 from .base import Agent
 from .execution import ExecutionAgent
 from ..models import TradingDecision, TradeSide, SystemConfiguration
-from ..services.system import get_system_configuration, set_trading_enabled
-from ..kpi.services import get_daily_pnl, get_weekly_pnl
+from ..services.system import cache_system_configuration, set_trading_enabled, system_config_cache_generation
+from ..services.market_data import PriceSnapshot, price_snapshot as shared_price_snapshot
+from ..kpi.services import PNL_TRANSACTION_TYPES_SQL
 
 logger = logging.getLogger(__name__)
 
+# The pnl CTE of the cycle state query always yields exactly one row, so the
+# result has at least one row even without a config row or any positions.
+SELECT_RISK_CYCLE_STATE_SQL = f"""
+    WITH bounds AS (
+        SELECT date_trunc('day', NOW() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' AS day_start,
+               date_trunc('week', NOW() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' AS week_start
+    ),
+    pnl AS (
+        SELECT
+            COALESCE(SUM(t.amount) FILTER (WHERE t.timestamp >= b.day_start), 0) AS daily_pnl,
+            COALESCE(SUM(t.amount), 0) AS weekly_pnl
+        FROM bounds b
+        LEFT JOIN transactions t
+          ON t.transaction_type IN {PNL_TRANSACTION_TYPES_SQL}
+         AND t.timestamp >= b.week_start
+         AND t.timestamp < NOW()
+    )
+    SELECT
+        cfg.id AS config_id,
+        cfg.is_trading_enabled,
+        cfg.daily_loss_limit_usd,
+        cfg.weekly_loss_limit_usd,
+        cfg.updated_at AS config_updated_at,
+        pnl.daily_pnl,
+        pnl.weekly_pnl,
+        pos.id,
+        pos.exchange_instrument_id,
+        pos.exchange_symbol,
+        pos.symbol,
+        pos.quantity,
+        pos.average_entry_price,
+        pos.initial_stop_loss,
+        (
+            SELECT array_agg(prt.rule_name)
+            FROM position_rule_triggers prt
+            WHERE prt.position_id = pos.id
+        ) AS fired_rules
+    FROM pnl
+    LEFT JOIN system_configuration cfg ON cfg.id = 1
+    LEFT JOIN active_positions_v pos ON pos.account_id = %(account_id)s;
+"""
+
+SELECT_LATEST_PRICES_SQL = """
+    SELECT ei.exchange_symbol, c.close
+    FROM exchange_instruments ei
+    LEFT JOIN instruments i ON ei.instrument_id = i.id
+    CROSS JOIN LATERAL (
+        SELECT close
+        FROM candles
+        WHERE symbol = COALESCE(i.symbol, ei.exchange_symbol) AND timeframe = '1m'
+        ORDER BY timestamp DESC
+        LIMIT 1
+    ) c
+    WHERE ei.exchange_symbol = ANY(%s);
+"""
+
+INSERT_RISK_TRANSACTION_SQL = """
+    INSERT INTO transactions (account_id, related_order_id, transaction_type, amount)
+    VALUES (%s, %s, %s, %s);
+"""
+
+INSERT_RULE_TRIGGER_SQL = """
+    INSERT INTO position_rule_triggers (position_id, rule_name)
+    VALUES (%s, %s)
+    ON CONFLICT DO NOTHING;
+"""
+
+# The enqueue_notification function is defined in the DB schema
+ENQUEUE_NOTIFICATION_SQL = "SELECT enqueue_notification(%s, %s, %s, %s, %s);"
+
+
+@dataclass(slots=True)
+class Position:
+    """An open position, as loaded for a risk cycle."""
+    id: int
+    exchange_instrument_id: int
+    exchange_symbol: str
+    # The generic symbol (e.g., 'BTC/USDT') market data is recorded under.
+    symbol: str
+    quantity: Decimal
+    average_entry_price: Decimal
+    initial_stop_loss: Decimal | None
+    # Names of the rules already executed for this position.
+    fired_rules: frozenset[str] = frozenset()
+    # Set once the position has been evaluated against the current price.
+    r_multiple: float | None = None
+
+
+@dataclass(slots=True, frozen=True)
+class RiskRule:
+    """A risk management rule, triggered once a position reaches `profit_r`."""
+    name: str
+    profit_r: float
+    action: str
+    params: dict = field(default_factory=dict)
+
 
 class RiskAgent(Agent):
     """
@@ -28,7 +127,13 @@ class RiskAgent(Agent):
     - Sending notifications for all actions taken.
     """
 
-    def __init__(self, db_connection, execution_agent: ExecutionAgent, account_id: int = 1):
+    def __init__(
+        self,
+        db_connection,
+        execution_agent: ExecutionAgent,
+        account_id: int = 1,
+        price_snapshot: PriceSnapshot | None = None,
+    ):
         """
         Initializes the RiskAgent with a database connection and an execution agent.
 
@@ -36,10 +141,13 @@ class RiskAgent(Agent):
             db_connection: An active psycopg3 database connection object.
             execution_agent: An instance of ExecutionAgent to submit orders.
             account_id: The account ID to monitor positions for.
+            price_snapshot: The in-memory prices recorded by the IngestionAgent.
+                Defaults to the snapshot shared within this process.
         """
         self.db = db_connection
         self.execution_agent = execution_agent
         self.account_id = account_id
+        self.price_snapshot = price_snapshot if price_snapshot is not None else shared_price_snapshot
         self.logger = logging.getLogger(self.__class__.__name__)
         self._define_risk_rules()
 
@@ -53,59 +161,109 @@ class RiskAgent(Agent):
         - rule_3: If profit > +3R, enable a trailing stop.
         """
         self.risk_rules = [
-            {"name": "partial_profit_1R", "profit_r": 1.0, "action": "close_partial", "params": {"percentage": 0.25}},
-            {"name": "breakeven_2R", "profit_r": 2.0, "action": "move_sl_to_be"},
-            {"name": "trailing_stop_3R", "profit_r": 3.0, "action": "trail_sl"},
+            RiskRule("partial_profit_1R", 1.0, "close_partial", {"percentage": 0.25}),
+            RiskRule("breakeven_2R", 2.0, "move_sl_to_be"),
+            RiskRule("trailing_stop_3R", 3.0, "trail_sl"),
         ]
-        self.logger.info(f"Loaded {len(self.risk_rules)} risk rules.")
+        self._sort_risk_rules()
+        self.logger.info("Loaded %d risk rules.", len(self.risk_rules))
 
-    def _get_active_positions(self) -> list[dict]:
+    def add_risk_rule(self, rule: RiskRule):
+        """Adds a risk rule to the agent's rule set."""
+        self.risk_rules.append(rule)
+        self._sort_risk_rules()
+
+    def _sort_risk_rules(self):
         """
-        Fetches all active positions (quantity != 0) for the agent's account.
+        Orders the rules by ascending profit threshold once, so that position
+        evaluation can find the highest-R rule each position reaches with a
+        single binary search over the thresholds.
         """
-        query = """
-        SELECT
-            p.id,
-            p.exchange_instrument_id,
-            ei.exchange_symbol,
-            p.quantity,
-            p.average_entry_price,
-            p.initial_stop_loss
-        FROM positions p
-        JOIN exchange_instruments ei ON p.exchange_instrument_id = ei.id
-        WHERE p.account_id = %s AND p.quantity != 0;
+        self._rules_sorted_asc = sorted(self.risk_rules, key=lambda r: r.profit_r)
+        self._rule_thresholds_asc = np.array([r.profit_r for r in self._rules_sorted_asc], dtype=np.float64)
+        # Positions below the lowest threshold can't trigger any rule.
+        self._min_profit_r = self._rule_thresholds_asc[0] if self.risk_rules else np.inf
+
+    def _load_cycle_state(self, cursor: psycopg.Cursor) -> tuple[SystemConfiguration | None, float, float, list[Position]]:
         """
-        positions = []
+        Loads everything a risk cycle needs in a single round trip: the system
+        configuration, the realized PnL for the current day and week (UTC,
+        weeks starting on Monday), and all active positions (quantity != 0)
+        for the agent's account.
+
+        Args:
+            cursor: The cycle's cursor, returning rows as dicts.
+
+        Returns:
+            A tuple of (config, daily_pnl, weekly_pnl, positions). On a database
+            error, config is None and there are no positions.
+        """
+        # Taken before the read, so that a config changed meanwhile isn't cached.
+        config_generation = system_config_cache_generation()
         try:
-            with self.db.cursor() as cursor:
-                cursor.execute(query, (self.account_id,))
-                results = cursor.fetchall()
-                # Get column names from the cursor description
-                columns = [desc[0] for desc in cursor.description]
-                for row in results:
-                    positions.append(dict(zip(columns, row)))
+            cursor.execute(
+                SELECT_RISK_CYCLE_STATE_SQL,
+                {"account_id": self.account_id},
+                prepare=True,
+            )
+            rows = cursor.fetchall()
         except psycopg.Error as e:
-            self.logger.error(f"Database error while fetching active positions: {e}")
-            return [] # Return empty list on error
+            self.logger.error("Database error while loading risk cycle state: %s", e)
+            self.db.rollback()
+            return None, 0.0, 0.0, []
+
+        first = rows[0]
+        config = None
+        if first['config_id'] is not None:
+            config = SystemConfiguration(
+                id=first['config_id'],
+                is_trading_enabled=first['is_trading_enabled'],
+                daily_loss_limit_usd=float(first['daily_loss_limit_usd']),
+                weekly_loss_limit_usd=float(first['weekly_loss_limit_usd']),
+                updated_at=first['config_updated_at'],
+            )
+            # Share the fresh config so the ExecutionAgent's kill-switch check for
+            # any closing orders this cycle is served from the cache, unless it
+            # was invalidated since the query started.
+            cache_system_configuration(config, config_generation)
+
+        positions = [
+            Position(
+                id=row['id'],
+                exchange_instrument_id=row['exchange_instrument_id'],
+                exchange_symbol=row['exchange_symbol'],
+                symbol=row['symbol'],
+                quantity=row['quantity'],
+                average_entry_price=row['average_entry_price'],
+                initial_stop_loss=row['initial_stop_loss'],
+                fired_rules=frozenset(row['fired_rules'] or ()),
+            )
+            for row in rows
+            if row['id'] is not None
+        ]
 
-        self.logger.info(f"Found {len(positions)} active position(s).")
-        return positions
+        self.logger.info("Found %d active position(s).", len(positions))
+        return config, float(first['daily_pnl']), float(first['weekly_pnl']), positions
 
-    def _check_global_loss_limits(self):
+    def _check_global_loss_limits(
+        self, cursor: psycopg.Cursor, config: SystemConfiguration | None, daily_pnl: float, weekly_pnl: float
+    ):
         """
         M10 Guardrail: Checks daily and weekly PnL against configured loss limits.
         If a limit is breached, it activates the global kill switch and sends a CRITICAL alert.
+
+        Args:
+            cursor: The cycle's cursor.
+            config: The current system configuration.
+            daily_pnl: Realized PnL for the current day.
+            weekly_pnl: Realized PnL for the current week.
         """
         # First, check if trading is already disabled. If so, do nothing.
-        config = get_system_configuration(self.db)
         if not config or not config.is_trading_enabled:
             # No need to log here as the ExecutionAgent will log if it blocks trades.
             return
 
-        # Get daily and weekly PnL
-        daily_pnl = get_daily_pnl(self.db)
-        weekly_pnl = get_weekly_pnl(self.db)
-        self.logger.info(f"PnL Check - Daily: ${daily_pnl:.2f}, Weekly: ${weekly_pnl:.2f}")
+        self.logger.info("PnL Check - Daily: $%.2f, Weekly: $%.2f", daily_pnl, weekly_pnl)
 
         limit_breached = False
         breach_reason = ""
@@ -119,7 +277,7 @@ class RiskAgent(Agent):
             breach_reason = f"Weekly loss limit of ${config.weekly_loss_limit_usd:.2f} breached (This Week's PnL: ${weekly_pnl:.2f})"
 
         if limit_breached:
-            self.logger.critical(f"LOSS LIMIT BREACHED: {breach_reason}")
+            self.logger.critical("LOSS LIMIT BREACHED: %s", breach_reason)
 
             # 1. Activate the kill switch
             self.logger.info("Activating global kill switch due to loss limit breach.")
@@ -128,17 +286,16 @@ class RiskAgent(Agent):
             # 2. Send a CRITICAL notification
             self.logger.info("Sending CRITICAL notification for loss limit breach.")
             try:
-                with self.db.cursor() as cursor:
-                    # In a real system, this chat_id would come from a config for admin alerts.
-                    admin_chat_id = 1
-                    notify_sql = "SELECT enqueue_notification(%s, 'CRITICAL', %s, %s, %s);"
-                    title = "!!! TRADING HALTED - LOSS LIMIT BREACHED !!!"
-                    dedupe_key = f"loss-limit-breach-{datetime.now(timezone.utc).strftime('%Y-%m-%d')}"
-                    cursor.execute(notify_sql, (admin_chat_id, title, breach_reason, dedupe_key))
-                    self.db.commit()
-                    self.logger.info("Successfully enqueued CRITICAL notification.")
+                # In a real system, this chat_id would come from a config for admin alerts.
+                admin_chat_id = 1
+                notify_sql = "SELECT enqueue_notification(%s, 'CRITICAL', %s, %s, %s);"
+                title = "!!! TRADING HALTED - LOSS LIMIT BREACHED !!!"
+                dedupe_key = f"loss-limit-breach-{datetime.now(timezone.utc).strftime('%Y-%m-%d')}"
+                cursor.execute(notify_sql, (admin_chat_id, title, breach_reason, dedupe_key))
+                self.db.commit()
+                self.logger.info("Successfully enqueued CRITICAL notification.")
             except psycopg.Error as e:
-                self.logger.error(f"Failed to enqueue CRITICAL notification for loss limit breach: {e}")
+                self.logger.error("Failed to enqueue CRITICAL notification for loss limit breach: %s", e)
                 self.db.rollback()
 
 
@@ -149,109 +306,200 @@ class RiskAgent(Agent):
         """
         self.logger.info("Running risk management cycle...")
 
-        # --- M10 Guardrail: Global Loss Limit Check ---
-        self._check_global_loss_limits()
+        # One cursor serves all of the cycle's own queries and writes.
+        with self.db.cursor(row_factory=psycopg.rows.dict_row) as cursor:
+            config, daily_pnl, weekly_pnl, active_positions = self._load_cycle_state(cursor)
 
-        active_positions = self._get_active_positions()
+            # --- M10 Guardrail: Global Loss Limit Check ---
+            self._check_global_loss_limits(cursor, config, daily_pnl, weekly_pnl)
 
-        if not active_positions:
-            self.logger.info("No active positions found. Ending cycle.")
-            return
+            if not active_positions:
+                self.logger.info("No active positions found. Ending cycle.")
+                return
 
-        for position in active_positions:
-            self.logger.info(f"Evaluating position: {position}")
-            self._evaluate_position_risk(position)
+            # Prefer the fresh in-memory prices; fetch any others in one round trip
+            # rather than one per position.
+            prices = {}
+            for position in active_positions:
+                price = self.price_snapshot.get(position.symbol)
+                if price is not None:
+                    prices[position.exchange_symbol] = price
+            missing = {p.exchange_symbol for p in active_positions} - prices.keys()
+            if missing:
+                prices.update(self._get_current_market_prices(cursor, missing))
+
+            # Evaluation is pure computation over the loaded state; the resulting
+            # actions are executed afterwards, one after another, as they share
+            # this agent's single database connection.
+            triggered = self._evaluate_positions(active_positions, prices)
+
+            for position, rule in triggered:
+                self._execute_risk_action(position, rule, cursor)
+
+    def _record_risk_action(
+        self, cursor: psycopg.Cursor, tx_row: tuple, notify_args: tuple, trigger_row: tuple
+    ):
+        """
+        Writes a risk action's log entry, notification and fired rule record
+        in one pipelined batch and a single commit.
 
-    def _get_current_market_price(self, symbol: str) -> float | None:
+        This runs right after the action's closing order is committed, so a
+        failure can leave at most that one order without its log entry.
         """
-        [PLACEHOLDER] Fetches the current market price for a symbol.
+        try:
+            with self.db.pipeline():
+                cursor.execute(INSERT_RISK_TRANSACTION_SQL, tx_row, prepare=True)
+                cursor.execute(ENQUEUE_NOTIFICATION_SQL, notify_args, prepare=True)
+                cursor.execute(INSERT_RULE_TRIGGER_SQL, trigger_row, prepare=True)
+            self.db.commit()
+            self.logger.info("Logged risk action for order %s and enqueued its notification.", tx_row[1])
+        except psycopg.Error as e:
+            self.logger.error("Failed to log risk action for order %s: %s", tx_row[1], e)
+            self.db.rollback()
+            # The closing order is already committed; without its log entry it
+            # is an orphan. This needs a robust reconciliation process.
 
-        TODO: This needs to be implemented to fetch data from the IngestionAgent's
-        output (e.g., a 'candles' table or a shared in-memory snapshot).
-        For now, we'll simulate a price for development.
+    def _get_current_market_prices(self, cursor: psycopg.Cursor, symbols) -> dict[str, float]:
         """
-        self.logger.warning(f"Using placeholder market price for {symbol}")
-        if "BTC" in symbol:
-            return 70000.0  # Simulate a profitable move
-        return 100.0
+        Fetches the latest market price for each of the given exchange symbols.
+
+        The price is the close of the most recent 1m candle stored by the
+        IngestionAgent, which records candles under the generic symbol (e.g.,
+        'BTC/USDT'); the exchange-specific symbol is used when no generic one
+        is known.
+
+        Args:
+            cursor: The cycle's cursor, returning rows as dicts.
+            symbols: The exchange symbols to price.
 
-    def _evaluate_position_risk(self, position: dict):
+        Returns:
+            A mapping of exchange symbol to price. Symbols without any stored
+            candle are absent.
         """
-        Calculates the position's current PnL and evaluates it against risk rules.
+        try:
+            cursor.execute(SELECT_LATEST_PRICES_SQL, (list(symbols),), prepare=True)
+            return {row['exchange_symbol']: row['close'] for row in cursor.fetchall()}
+        except psycopg.Error as e:
+            self.logger.error("Database error while fetching market prices: %s", e)
+            self.db.rollback()
+            return {}
+
+    def _evaluate_positions(self, positions: list[Position], prices: dict) -> list[tuple[Position, RiskRule]]:
         """
-        # Ensure all numeric values from the DB are treated as Decimals
-        entry_price = Decimal(position['average_entry_price'])
-        quantity = Decimal(position['quantity'])
-        initial_sl = position.get('initial_stop_loss')
-
-        if initial_sl is None:
-            # This logic branch is for backward compatibility or missing data.
-            # In our E2E test, we ensure initial_stop_loss is set.
-            initial_sl = entry_price * Decimal('0.98')
-            self.logger.warning(
-                f"Position {position['id']} is missing 'initial_stop_loss'. "
-                f"Simulating a 2% SL at {initial_sl}"
-            )
-        else:
-            initial_sl = Decimal(initial_sl)
+        Calculates every position's current R-multiple in one vectorized pass
+        and evaluates it against the risk rules.
 
-        current_price = self._get_current_market_price(position['exchange_symbol'])
-        if current_price is None:
-            self.logger.error(f"Could not fetch market price for {position['exchange_symbol']}. Skipping evaluation.")
-            return
+        Args:
+            positions: The positions, as loaded by `_load_cycle_state`.
+            prices: Current market prices keyed by exchange symbol.
 
-        current_price = Decimal(current_price)
+        Returns:
+            A (position, rule) pair for each position that triggers a rule,
+            with the highest-R rule it reaches that has not fired for it yet.
+        """
+        priced = []
+        for position in positions:
+            if position.exchange_symbol not in prices:
+                self.logger.error(
+                    "Could not fetch market price for %s. Skipping evaluation.", position.exchange_symbol
+                )
+                continue
+            if position.initial_stop_loss is None:
+                # This logic branch is for backward compatibility or missing data.
+                # In our E2E test, we ensure initial_stop_loss is set.
+                self.logger.warning(
+                    "Position %s is missing 'initial_stop_loss'. Simulating a 2%% SL.", position.id
+                )
+            priced.append(position)
+
+        if not priced:
+            return []
+
+        # Prices only feed the R-multiple comparison, so float precision is
+        # plenty; exact Decimal quantities are kept for the orders themselves.
+        count = len(priced)
+        entry = np.fromiter((p.average_entry_price for p in priced), dtype=np.float64, count=count)
+        current = np.fromiter((prices[p.exchange_symbol] for p in priced), dtype=np.float64, count=count)
+        stop_loss = np.fromiter(
+            (np.nan if p.initial_stop_loss is None else p.initial_stop_loss for p in priced),
+            dtype=np.float64,
+            count=count,
+        )
+        stop_loss = np.where(np.isnan(stop_loss), entry * 0.98, stop_loss)
+        is_long = np.fromiter((p.quantity > 0 for p in priced), dtype=bool, count=count)
 
         # --- R-Multiple Calculation ---
-        initial_risk_per_unit = abs(entry_price - initial_sl)
-        if initial_risk_per_unit == 0:
-            self.logger.warning(f"Initial risk is zero for position {position['id']}. Cannot calculate R-multiple.")
-            return
-
-        # Profit is positive for long gains and short gains
-        profit_per_unit = (current_price - entry_price) if quantity > 0 else (entry_price - current_price)
+        r_multiples = calculate_r_multiples(entry, current, stop_loss, is_long)
 
-        r_multiple = profit_per_unit / initial_risk_per_unit
-        self.logger.info(f"Position {position['id']} ({position['exchange_symbol']}): Current R-multiple is {r_multiple:.2f}")
+        for i in np.flatnonzero(np.isnan(r_multiples)):
+            self.logger.warning(
+                "Initial risk is zero for position %s. Cannot calculate R-multiple.", priced[i].id
+            )
 
         # --- Rule Evaluation ---
-        # Check rules in descending order of profit, so the highest-R rule triggers.
-        for rule in sorted(self.risk_rules, key=lambda r: r['profit_r'], reverse=True):
-            if r_multiple >= rule['profit_r']:
-                self.logger.info(f"TRIGGERED: Rule '{rule['name']}' for position {position['id']} at R={r_multiple:.2f}")
-                # Add the calculated R-multiple to the position dict to pass to the action executor
-                position['r_multiple'] = r_multiple
-                # TODO: Add state to prevent re-triggering the same rule for the same position.
-                # For now, we assume it's okay to re-evaluate every cycle.
-                self._execute_risk_action(position, rule)
-                # Stop checking after the first (highest) rule is triggered
-                break
-
-    def _execute_risk_action(self, position: dict, rule: dict):
+        # Most positions usually sit below the lowest rule threshold, so only
+        # the rest are looked up. NaN compares False, which also drops
+        # positions without an R-multiple.
+        hits = np.flatnonzero(r_multiples >= self._min_profit_r)
+        # Index of the highest threshold each remaining R-multiple reaches.
+        rule_idx = np.searchsorted(self._rule_thresholds_asc, r_multiples[hits], side="right") - 1
+
+        triggered = []
+        for i, idx in zip(hits, rule_idx):
+            position = priced[i]
+            # Rules fire once per position: fall back to the highest reached
+            # rule that hasn't fired yet.
+            while idx >= 0 and self._rules_sorted_asc[idx].name in position.fired_rules:
+                idx -= 1
+            if idx < 0:
+                continue
+            rule = self._rules_sorted_asc[idx]
+            # Record the calculated R-multiple on the position for the action executor
+            position.r_multiple = float(r_multiples[i])
+            self.logger.info(
+                "TRIGGERED: Rule '%s' for position %s (%s) at R=%.2f",
+                rule.name, position.id, position.exchange_symbol, position.r_multiple,
+            )
+            triggered.append((position, rule))
+
+        self.logger.info("Evaluated %d position(s); %d triggered a risk rule.", count, len(triggered))
+        return triggered
+
+    def _execute_risk_action(self, position: Position, rule: RiskRule, cursor: psycopg.Cursor):
         """
-        Logs the risk action to the DB, queues a notification, and executes the trade.
+        Executes the trade for a risk action, then records its transaction log
+        entry, notification and fired rule.
+
+        Args:
+            position: The position the rule triggered for.
+            rule: The triggered risk rule.
+            cursor: The cycle's cursor, used for the records.
         """
-        action = rule.get("action")
-        self.logger.info(f"Executing action '{action}' for position {position['id']}")
+        action = rule.action
+        self.logger.info("Executing action '%s' for position %s", action, position.id)
 
         # For now, we only implement 'close_partial'. Other actions are placeholders.
         if action == "close_partial":
-            percentage_str = str(rule.get("params", {}).get("percentage", "0.0"))
+            percentage_str = str(rule.params.get("percentage", "0.0"))
             percentage = Decimal(percentage_str)
 
             if not (Decimal('0') < percentage <= Decimal('1.0')):
-                self.logger.error(f"Invalid percentage {percentage} for close_partial. Must be between 0 and 1.")
+                self.logger.error("Invalid percentage %s for close_partial. Must be between 0 and 1.", percentage)
                 return
 
             # 1. Determine order parameters
-            position_qty = Decimal(position['quantity'])
+            # Quantities are NUMERIC columns, which psycopg already returns as Decimal;
+            # anything else is converted through str to keep its exact value.
+            position_qty = position.quantity
+            if not isinstance(position_qty, Decimal):
+                position_qty = Decimal(str(position_qty))
             close_qty = position_qty * percentage
             # Side is the opposite of the current position
             close_side = TradeSide.SELL if position_qty > 0 else TradeSide.BUY
 
             # 2. Create a TradingDecision for the closing order
             decision = TradingDecision(
-                symbol=position['exchange_symbol'],
+                symbol=position.exchange_symbol,
                 side=close_side,
                 quantity=float(close_qty), # Pass the calculated quantity
                 # SL/TP for a closing order is typically not needed. Pydantic requires them.
@@ -267,47 +515,27 @@ class RiskAgent(Agent):
             # We will simulate this by calling its internal method for now, which is not ideal but necessary.
             order_id = self.execution_agent._execute_decision(decision)
             if order_id is None:
-                self.logger.error(f"Failed to create closing order for position {position['id']}.")
+                self.logger.error("Failed to create closing order for position %s.", position.id)
                 return
 
-            # 4. Log the action to the 'transactions' table
-            try:
-                with self.db.cursor() as cursor:
-                    tx_sql = """
-                    INSERT INTO transactions (account_id, related_order_id, transaction_type, amount)
-                    VALUES (%s, %s, %s, %s);
-                    """
-                    tx_type = f"RISK_ACTION_{rule['name'].upper()}"
-                    # Amount is the quantity of the asset transacted
-                    cursor.execute(tx_sql, (self.account_id, order_id, tx_type, close_qty))
-                    self.db.commit()
-                    self.logger.info(f"Logged risk action to transactions table for order {order_id}.")
-            except psycopg.Error as e:
-                self.logger.error(f"Failed to log risk action transaction: {e}")
-                self.db.rollback()
-                # If logging fails, we have an orphan order. This needs a robust reconciliation process.
-                return
-
-            # 5. Enqueue a notification
-            try:
-                with self.db.cursor() as cursor:
-                    # The enqueue_notification function is defined in the DB schema
-                    notify_sql = "SELECT enqueue_notification(%s, %s, %s, %s, %s);"
-                    chat_id = -1 # Placeholder chat_id
-                    severity = 'INFO'
-                    title = f"Risk Action: {rule['name']}"
-                    message = (f"Executed {rule['name']} for {position['exchange_symbol']}.\n"
-                               f"Closed {close_qty:.4f} at R-multiple {position['r_multiple']:.2f}.")
-                    dedupe_key = f"risk-action-{position['id']}-{rule['name']}-{order_id}"
-                    cursor.execute(notify_sql, (chat_id, severity, title, message, dedupe_key))
-                    self.db.commit()
-                    self.logger.info(f"Enqueued notification for risk action on position {position['id']}.")
-            except psycopg.Error as e:
-                self.logger.error(f"Failed to enqueue notification: {e}")
-                self.db.rollback()
+            # 4. Record the 'transactions' log entry, the notification and the fired
+            # rule record, before moving on to the next action.
+            tx_type = f"RISK_ACTION_{rule.name.upper()}"
+            # Amount is the quantity of the asset transacted
+            tx_row = (self.account_id, order_id, tx_type, close_qty)
+
+            chat_id = -1 # Placeholder chat_id
+            severity = 'INFO'
+            title = f"Risk Action: {rule.name}"
+            message = (f"Executed {rule.name} for {position.exchange_symbol}.\n"
+                       f"Closed {close_qty:.4f} at R-multiple {position.r_multiple:.2f}.")
+            dedupe_key = f"risk-action-{position.id}-{rule.name}-{order_id}"
+            self._record_risk_action(
+                cursor, tx_row, (chat_id, severity, title, message, dedupe_key), (position.id, rule.name)
+            )
 
         else:
-            self.logger.warning(f"Action '{action}' is not yet implemented.")
+            self.logger.warning("Action '%s' is not yet implemented.", action)
 
 
 def calculate_r_multiple(
@@ -344,3 +572,27 @@ def calculate_r_multiple(
         return None
 
     return profit_per_unit / initial_risk_per_unit
+
+
+def calculate_r_multiples(
+    entry_prices: np.ndarray,
+    current_prices: np.ndarray,
+    stop_loss_prices: np.ndarray,
+    is_long: np.ndarray,
+) -> np.ndarray:
+    """
+    Vectorized form of `calculate_r_multiple` over arrays of positions.
+
+    Args:
+        entry_prices: The average entry price of each position.
+        current_prices: The current market price of each position.
+        stop_loss_prices: The stop-loss price of each position.
+        is_long: True for long (BUY) positions, False for short (SELL) ones.
+
+    Returns:
+        The R-multiple of each position, NaN where the initial risk is zero.
+    """
+    initial_risk_per_unit = np.abs(entry_prices - stop_loss_prices)
+    profit_per_unit = np.where(is_long, current_prices - entry_prices, entry_prices - current_prices)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(initial_risk_per_unit != 0, profit_per_unit / initial_risk_per_unit, np.nan)
@@ -3,165 +3,506 @@ Skeleton implementations of the agents described in PG_Solo_Lite_AGENTS.md.
 
 These are placeholders to be filled in with actual logic in later stages.
 """
+import asyncio
+import atexit
+import functools
 import logging
+import random
+import threading
 import time
-from datetime import datetime, timezone
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
+import aiohttp
 import ccxt
+import ccxt.async_support as ccxt_async
+import numpy as np
+import psycopg
 
-from ..models import MarketSnapshot
+try:
+    # libuv-based event loop, markedly faster for network I/O (not on Windows).
+    import uvloop
+except ImportError:
+    uvloop = None
+
+from ..services.market_data import price_snapshot
 from .base import Agent
 
 logger = logging.getLogger(__name__)
 
+# Options applied to every exchange client: let ccxt pace requests with its
+# internal rate limiter and bound each HTTP call.
+EXCHANGE_OPTIONS = {"enableRateLimit": True, "timeout": 10000}
+
+# Keep idle connections to the exchange open across ingestion runs (every
+# minute), well past aiohttp's 15s default.
+EXCHANGE_CONNECTION_LIMIT = 32
+EXCHANGE_KEEPALIVE_SECONDS = 75
+
+
+class ExchangeRegistry:
+    """
+    Process-wide async ccxt clients, one per exchange_id, reused across runs.
+
+    An aiohttp session is bound to the event loop that opened it, so the
+    clients live on a dedicated event loop (uvloop, when installed) running
+    in a daemon thread, and callers submit their coroutines to it with
+    `run()`. Connections (and their TLS sessions) and loaded markets thus
+    survive between runs. The clients are closed at interpreter exit.
+
+    The loop is shared by every agent in the process, so coroutines passed to
+    `run()` must not do blocking I/O (database access in particular): it
+    would stall all other exchange requests for its duration. Do such work in
+    the calling thread once `run()` returns.
+    """
+
+    def __init__(self):
+        self._exchanges: dict = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = uvloop.new_event_loop() if uvloop is not None else asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever, name="exchange-loop", daemon=True
+                ).start()
+                atexit.register(self.close)
+            return self._loop
+
+    def run(self, coro):
+        """
+        Runs a coroutine on the registry's event loop and returns its result.
+
+        The coroutine must not block (see the class docstring).
+        """
+        loop = self._get_loop()
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            coro.close()
+            raise RuntimeError("ExchangeRegistry.run() must not be called from the registry's own event loop.")
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    def get(self, exchange_id: str):
+        """Returns the shared client for the exchange, creating it on first use."""
+        if exchange_id not in ccxt_async.exchanges:
+            raise ValueError(f"Unsupported exchange: {exchange_id}")
+        with self._lock:
+            exchange = self._exchanges.get(exchange_id)
+        if exchange is None:
+            created = self.run(self._create(exchange_id))
+            with self._lock:
+                exchange = self._exchanges.setdefault(exchange_id, created)
+            if exchange is not created:
+                self.run(self._close(created))
+        return exchange
+
+    @staticmethod
+    async def _create(exchange_id: str):
+        # Runs on the registry's loop, which the session is bound to.
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=EXCHANGE_CONNECTION_LIMIT,
+                keepalive_timeout=EXCHANGE_KEEPALIVE_SECONDS,
+                enable_cleanup_closed=True,
+            )
+        )
+        return getattr(ccxt_async, exchange_id)({**EXCHANGE_OPTIONS, "session": session})
+
+    @staticmethod
+    async def _close(exchange):
+        # ccxt leaves a session passed in by the caller open.
+        session = exchange.session
+        await exchange.close()
+        if session is not None:
+            await session.close()
+
+    def close(self):
+        """Closes all clients and stops the event loop."""
+        with self._lock:
+            exchanges, self._exchanges = list(self._exchanges.values()), {}
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+
+        async def close_all():
+            await asyncio.gather(*(self._close(e) for e in exchanges), return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(close_all(), loop).result(timeout=10)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+
+
+exchange_registry = ExchangeRegistry()
+
+class AIMDLimiter:
+    """
+    A concurrency limit for exchange requests that adapts to the exchange's
+    responses (additive increase, multiplicative decrease): each success
+    raises the limit by `increase`, each failure multiplies it by `decrease`.
+    """
+
+    def __init__(self, max_limit: float, min_limit: float = 1.0, increase: float = 0.5, decrease: float = 0.5):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.limit = max_limit
+        self._in_flight = 0
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._in_flight < int(self.limit))
+            self._in_flight += 1
+
+    async def __aexit__(self, *exc_info):
+        async with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        self.limit = min(self.max_limit, self.limit + self.increase)
+
+    def on_failure(self):
+        self.limit = max(self.min_limit, self.limit * self.decrease)
+
+
+# One limiter per exchange_id, kept across runs on the registry's event loop.
+_fetch_limiters: dict = {}
+_fetch_limiters_lock = threading.Lock()
+
+# Errors that signal an overloaded or throttling exchange, and so lower the
+# concurrency limit. (RateLimitExceeded and DDoSProtection are NetworkErrors
+# in ccxt; they are listed for clarity.) Other exchange errors, such as
+# BadSymbol, say nothing about load.
+LIMITER_BACKOFF_ERRORS = (ccxt.RateLimitExceeded, ccxt.DDoSProtection, ccxt.NetworkError)
+
+
+def _get_fetch_limiter(exchange_id: str, max_limit: int) -> AIMDLimiter:
+    """Returns the exchange's shared limiter, creating it on first use."""
+    with _fetch_limiters_lock:
+        if exchange_id not in _fetch_limiters:
+            _fetch_limiters[exchange_id] = AIMDLimiter(max_limit)
+        return _fetch_limiters[exchange_id]
+
+
+def _retry_after_seconds(headers) -> Optional[float]:
+    """Returns the delay advertised by a `Retry-After` header in seconds, if any."""
+    value = headers.get("Retry-After") if headers else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        # HTTP dates are not worth parsing here; use the regular backoff.
+        return None
+
+
+# Timestamp (epoch ms) of the newest candle stored per (exchange_id, symbol)
+# by this process. Each run re-fetches mostly candles that are already stored,
+# so only newer ones are sent to the database.
+_last_stored_ts: dict = {}
+
+
+# Trading rules change rarely, so they are kept per (exchange_id, symbol) for
+# this long before being re-read from `exchange_instruments`.
+TRADING_RULES_TTL_SECONDS = 3600
+
+# (exchange_id, symbol) -> (trading_rules or None, monotonic expiry time)
+_trading_rules_cache: dict = {}
+
+# Symbols match either the generic or the exchange-specific symbol.
+SELECT_TRADING_RULES_SQL = """
+    SELECT s.symbol, r.trading_rules
+    FROM unnest(%(symbols)s::text[]) AS s(symbol)
+    CROSS JOIN LATERAL (
+        SELECT ei.trading_rules
+        FROM exchange_instruments ei
+        JOIN exchanges e ON e.id = ei.exchange_id
+        LEFT JOIN instruments i ON i.id = ei.instrument_id
+        WHERE e.name = %(exchange_id)s AND (i.symbol = s.symbol OR ei.exchange_symbol = s.symbol)
+        LIMIT 1
+    ) r;
+"""
+
+
+@functools.cache
+def _check_psycopg_impl():
+    """
+    Warns (once) if psycopg is running on its pure-Python implementation,
+    which makes the binary COPY of candles markedly slower.
+    """
+    if psycopg.pq.__impl__ not in ("c", "binary"):
+        logger.warning(
+            "psycopg is using the '%s' implementation; install psycopg[binary] or "
+            "psycopg[c] for fast COPY.",
+            psycopg.pq.__impl__,
+        )
+
 
 class IngestionAgent(Agent):
     """
     Collects market data from a cryptocurrency exchange using ccxt.
 
-    - Fetches recent 1-minute OHLCV data for a predefined list of symbols.
+    - Fetches recent 1-minute OHLCV data for a predefined list of symbols,
+      concurrently across symbols.
     - Implements retry logic with exponential backoff for API calls.
-    - Caches trading rules for the symbols (placeholder).
+    - Caches the symbols' trading rules from `exchange_instruments`, shared
+      across runs for TRADING_RULES_TTL_SECONDS.
+    - Persists the fetched candles to the `candles` table when a database
+      connection is provided.
+    - Records each symbol's latest close in the shared in-memory price
+      snapshot read by the RiskAgent.
     """
+    # Upper bound on in-flight exchange requests, to stay within rate limits.
+    # The actual limit adapts below this to the exchange's responses.
+    MAX_CONCURRENT_FETCHES = 8
+    # Cap on a single retry backoff.
+    MAX_RETRY_DELAY_SECONDS = 30
 
-    def __init__(self, symbols: List[str], exchange_id: str = "binance"):
+    def __init__(
+        self,
+        symbols: List[str],
+        exchange_id: str = "binance",
+        db_connection: Optional[psycopg.Connection] = None,
+    ):
         self.symbols = symbols
         self.exchange_id = exchange_id
-        self.exchange = getattr(ccxt, self.exchange_id)()
+        self.db_connection = db_connection
+        if db_connection is not None:
+            _check_psycopg_impl()
+        self.exchange = exchange_registry.get(self.exchange_id)
+        # The capability is static per exchange, so it is checked once.
+        self._supports_ohlcv = bool(self.exchange.has.get("fetchOHLCV"))
         self.logger = logging.getLogger(self.__class__.__name__)
         self._trading_rules_cache = {}
+        self._limiter = _get_fetch_limiter(self.exchange_id, self.MAX_CONCURRENT_FETCHES)
 
     def run(self):
         """The main entry point for the agent's logic."""
-        self.logger.info(f"IngestionAgent running for symbols: {self.symbols}")
-        # In a real scenario, this might be an async loop or scheduled job.
-        # For now, we run once.
-
-        # Placeholder for caching trading rules
+        self.logger.info("IngestionAgent running for symbols: %s", self.symbols)
         self._cache_trading_rules()
 
-        for symbol in self.symbols:
-            self.logger.info(f"Fetching market data for {symbol}...")
-            snapshots = self._fetch_ohlcv_with_retry(symbol)
-            if snapshots:
+        new_candles = exchange_registry.run(self._run_async())
+
+        # The database write is blocking, so it runs here, on the scheduler's
+        # worker thread that checked out the connection, and not on the
+        # registry's shared event loop.
+        # All symbols are stored in a single COPY and commit.
+        if new_candles and self._save_candles_to_db(new_candles):
+            for symbol, candles in new_candles:
+                _last_stored_ts[(self.exchange_id, symbol)] = int(candles[-1, 0])
+
+    async def _run_async(self) -> List[Tuple[str, np.ndarray]]:
+        """
+        Fetches all symbols concurrently.
+
+        Returns:
+            The (symbol, candles) pairs with candles newer than those already
+            stored by this process, to be persisted by the caller. Empty when
+            there is no database connection.
+        """
+        if not self._supports_ohlcv:
+            self.logger.warning("Exchange %s does not support fetchOHLCV.", self.exchange_id)
+            return []
+
+        async def fetch(symbol: str):
+            self.logger.debug("Fetching market data for %s...", symbol)
+            return await self._fetch_ohlcv_with_retry(symbol)
+
+        results = await asyncio.gather(
+            *(fetch(symbol) for symbol in self.symbols), return_exceptions=True
+        )
+
+        fetched = []
+        for symbol, candles in zip(self.symbols, results):
+            if isinstance(candles, Exception):
+                self.logger.error("Unexpected error while fetching market data for %s: %s", symbol, candles)
+            elif candles is not None and len(candles):
                 self.logger.info(
-                    f"Successfully fetched {len(snapshots)} snapshots for {symbol}."
+                    "Successfully fetched %d candles for %s.", len(candles), symbol
                 )
-                # In a real implementation, we would now store this data in the
-                # `candles` table or pass it to another agent via an in-memory queue.
-                for snapshot in snapshots:
-                    self.logger.debug(snapshot.model_dump_json())
+                # ccxt returns candles oldest first; the last close is the latest price.
+                price_snapshot.update(symbol, float(candles[-1, 4]))
+                fetched.append((symbol, candles))
             else:
                 self.logger.error(
-                    f"Failed to fetch market data for {symbol} after multiple retries."
+                    "Failed to fetch market data for %s after multiple retries.", symbol
                 )
 
+        if not fetched or self.db_connection is None:
+            return []
+
+        new_candles = []
+        for symbol, candles in fetched:
+            last_ts = _last_stored_ts.get((self.exchange_id, symbol))
+            if last_ts is not None:
+                candles = candles[candles[:, 0] > last_ts]
+            if len(candles):
+                new_candles.append((symbol, candles))
+        return new_candles
+
     def _cache_trading_rules(self):
         """
-        Fetches and caches trading rules for the symbols.
+        Loads the trading rules (`exchange_instruments.trading_rules`) for the
+        symbols into `self._trading_rules_cache`.
 
-        Placeholder as per M3 requirements. In a real implementation, this would
-        fetch rules from the exchange and store them, potentially in the
-        `exchange_instruments` table or an in-memory cache.
+        Rules are served from a process-wide cache keyed by (exchange_id,
+        symbol); only missing or expired entries are read from the database.
+        Symbols without a matching instrument are cached as None.
         """
-        self.logger.info("Caching trading rules (placeholder)...")
-        # Example: self._trading_rules_cache = self.exchange.load_markets()
-        pass
+        now = time.monotonic()
+        misses = []
+        for symbol in self.symbols:
+            cached = _trading_rules_cache.get((self.exchange_id, symbol))
+            if cached is not None and cached[1] > now:
+                self._trading_rules_cache[symbol] = cached[0]
+            else:
+                misses.append(symbol)
 
-    def _fetch_ohlcv_with_retry(
+        if not misses or self.db_connection is None:
+            return
+
+        self.logger.info("Loading trading rules for %s...", misses)
+        try:
+            # All misses are loaded in one round trip.
+            with self.db_connection.cursor() as cursor:
+                cursor.execute(
+                    SELECT_TRADING_RULES_SQL,
+                    {"symbols": misses, "exchange_id": self.exchange_id},
+                    prepare=True,
+                )
+                loaded = dict(cursor.fetchall())
+            self.db_connection.commit()
+        except psycopg.Error as e:
+            self.logger.error("Database error while loading trading rules: %s", e)
+            self.db_connection.rollback()
+            return
+
+        expires_at = now + TRADING_RULES_TTL_SECONDS
+        for symbol in misses:
+            rules = loaded.get(symbol)
+            _trading_rules_cache[(self.exchange_id, symbol)] = (rules, expires_at)
+            self._trading_rules_cache[symbol] = rules
+
+    def _save_candles_to_db(self, fetched: List[Tuple[str, np.ndarray]], timeframe: str = "1m") -> bool:
+        """
+        Bulk-loads the candles of all fetched symbols into the `candles` table
+        in one transaction.
+
+        Rows are streamed with binary COPY into a temporary staging table and
+        then merged with `INSERT ... SELECT ... ON CONFLICT DO NOTHING`, so
+        candles that were already stored by a previous run are skipped.
+        Timestamps are staged as epoch milliseconds and converted by the server.
+
+        Args:
+            fetched: (symbol, candles) pairs, where candles is an (N, 6) float64
+                array of [timestamp_ms, open, high, low, close, volume].
+            timeframe: The candle timeframe.
+
+        Returns:
+            True if the candles were committed.
+        """
+        total = sum(len(candles) for _, candles in fetched)
+        try:
+            with self.db_connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    CREATE TEMP TABLE candles_stage (
+                        symbol VARCHAR(20), timeframe VARCHAR(10), ts_ms BIGINT,
+                        open FLOAT8, high FLOAT8, low FLOAT8, close FLOAT8, volume FLOAT8
+                    ) ON COMMIT DROP
+                    """
+                )
+                with cursor.copy(
+                    "COPY candles_stage (symbol, timeframe, ts_ms, open, high, low, close, volume) "
+                    "FROM STDIN WITH (FORMAT BINARY)"
+                ) as copy:
+                    copy.set_types([
+                        "varchar", "varchar", "int8",
+                        "float8", "float8", "float8", "float8", "float8",
+                    ])
+                    for symbol, candles in fetched:
+                        timestamps_ms = candles[:, 0].astype(np.int64).tolist()
+                        prices = candles[:, 1:].tolist()
+                        for ts_ms, (open_, high, low, close, volume) in zip(timestamps_ms, prices):
+                            copy.write_row((symbol, timeframe, ts_ms, open_, high, low, close, volume))
+                cursor.execute(
+                    """
+                    INSERT INTO candles (symbol, timeframe, timestamp, open, high, low, close, volume)
+                    SELECT symbol, timeframe, to_timestamp(ts_ms / 1000.0), open, high, low, close, volume
+                    FROM candles_stage
+                    ON CONFLICT (symbol, timeframe, timestamp) DO NOTHING
+                    """
+                )
+                inserted = cursor.rowcount
+            self.db_connection.commit()
+            self.logger.info(
+                "Stored %d new candle(s) out of %d fetched for %d symbol(s).", inserted, total, len(fetched)
+            )
+            return True
+        except psycopg.Error as e:
+            self.logger.error("Database error while storing candles: %s", e)
+            self.db_connection.rollback()
+            return False
+
+    async def _fetch_ohlcv_with_retry(
         self,
         symbol: str,
         timeframe: str = "1m",
         limit: int = 10,
         max_retries: int = 3,
         initial_delay: int = 2,
-    ) -> Optional[List[MarketSnapshot]]:
+    ) -> Optional[np.ndarray]:
         """
         Fetches OHLCV data for a symbol with exponential backoff retry logic.
+
+        Backoff delays are fully jittered (uniform between 0 and the
+        exponential delay, capped at MAX_RETRY_DELAY_SECONDS) so that symbols
+        failing together don't retry in lock-step.
+
+        Each request holds a slot of the exchange's AIMD limiter, and a
+        `Retry-After` advertised with a rate-limit error is honored when it
+        is longer than the backoff.
+
+        Returns:
+            An (N, 6) float64 array of [timestamp_ms, open, high, low, close, volume]
+            rows, or None if the data could not be fetched.
         """
-        delay = initial_delay
         for attempt in range(max_retries):
             try:
-                if not self.exchange.has["fetchOHLCV"]:
-                    self.logger.warning(
-                        f"Exchange {self.exchange_id} does not support fetchOHLCV."
-                    )
-                    return None
-
                 # Fetch OHLCV data: [timestamp, open, high, low, close, volume]
-                ohlcv_data = self.exchange.fetch_ohlcv(
-                    symbol, timeframe=timeframe, limit=limit
-                )
-
-                snapshots = [
-                    MarketSnapshot(
-                        symbol=symbol,
-                        timestamp=datetime.fromtimestamp(data[0] / 1000, tz=timezone.utc),
-                        open=data[1],
-                        high=data[2],
-                        low=data[3],
-                        close=data[4],
-                        volume=data[5],
+                async with self._limiter:
+                    ohlcv_data = await self.exchange.fetch_ohlcv(
+                        symbol, timeframe=timeframe, limit=limit
                     )
-                    for data in ohlcv_data
-                ]
-                return snapshots
+                self._limiter.on_success()
+
+                # Keep the candles columnar; no per-row model objects are built.
+                return np.asarray(ohlcv_data, dtype=np.float64).reshape(-1, 6)
             except (ccxt.NetworkError, ccxt.ExchangeError) as e:
+                if isinstance(e, LIMITER_BACKOFF_ERRORS):
+                    self._limiter.on_failure()
+                wait = random.uniform(0, min(self.MAX_RETRY_DELAY_SECONDS, initial_delay * 2 ** attempt))
+                if isinstance(e, (ccxt.RateLimitExceeded, ccxt.DDoSProtection)):
+                    wait = max(wait, _retry_after_seconds(self.exchange.last_response_headers) or 0)
                 self.logger.warning(
-                    f"Attempt {attempt + 1}/{max_retries} failed for {symbol}: {e}. Retrying in {delay}s..."
+                    "Attempt %d/%d failed for %s: %s. Retrying in %.1fs...",
+                    attempt + 1, max_retries, symbol, e, wait,
                 )
                 if attempt < max_retries - 1:
-                    time.sleep(delay)
-                    delay *= 2  # Exponential backoff
+                    await asyncio.sleep(wait)
                 else:
-                    self.logger.error(f"All {max_retries} retries failed for {symbol}.")
+                    self.logger.error("All %d retries failed for %s.", max_retries, symbol)
                     return None
         return None
 
-from ..config import settings
-
-
-class StrategyAgent(Agent):
-    """
-    Generates trading decisions based on market data and configured strategy
-    parameters.
-    """
-
-    def __init__(self):
-        """Initializes the agent with strategy settings from the config."""
-        self.logger = logging.getLogger(self.__class__.__name__)
-        # Load strategy settings from the central config object
-        self.strategy_settings = settings.strategy
-        self.logger.info("StrategyAgent initialized with the following settings:")
-        self.logger.info(f"Timeframes: {self.strategy_settings.timeframes.model_dump_json()}")
-        self.logger.info(f"Volume Confirmation: {self.strategy_settings.volume_confirmation.model_dump_json()}")
-        self.logger.info(f"Risk Management: {self.strategy_settings.risk_management.model_dump_json()}")
-
-    def run(self):
-        """
-        The main entry point for the agent's logic.
-
-        For now, it just logs that it's running. In a real implementation, it
-        would analyze market data and generate TradingDecision objects based on
-        the loaded strategy parameters.
-        """
-        self.logger.info("StrategyAgent running...")
-        # Example of accessing a specific parameter:
-        # if self.strategy_settings.volume_confirmation.enabled:
-        #     self.logger.debug("Volume confirmation is enabled.")
-        pass
-
-class RiskAgent(Agent):
-    """Manages risk for open positions."""
-    def run(self):
-        logger.info("RiskAgent running...")
-        # In the future, this will monitor positions and manage stop-losses, etc.
-        pass
-
-class ReportAgent(Agent):
-    """Generates and sends reports."""
-    def run(self):
-        logger.info("ReportAgent running...")
-        # In the future, this will generate performance reports.
-        pass
+# RiskAgent, ReportAgent and StrategyAgent used to be defined here as well;
+# the single implementations are re-exported so this import path cannot
+# silently resolve to a stale copy.
+from .report import ReportAgent
+from .risk import RiskAgent
+from .strategy import StrategyAgent
@@ -2,14 +2,51 @@
 The StrategyAgent is responsible for analyzing market data and generating
 TradingDecision objects based on a predefined trading strategy.
 """
+import logging
+from typing import Optional
+
+from app.agents.base import Agent
+from app.config import get_settings
+from app.log_config import LazyJson
 from app.models import TradingDecision, MarketSnapshot, TradeSide
 
-class StrategyAgent:
+class StrategyAgent(Agent):
     """
-    A simple strategy agent that generates trading signals.
+    Generates trading decisions based on market data and configured strategy
+    parameters.
     """
-    def __init__(self, confidence_threshold: float = 0.5):
+    def __init__(self, confidence_threshold: Optional[float] = None):
+        """
+        Initializes the agent with strategy settings from the config.
+
+        Args:
+            confidence_threshold: Minimum confidence for a decision to be kept.
+                Defaults to the configured signal confidence threshold.
+        """
+        self.logger = logging.getLogger(self.__class__.__name__)
+        # Load strategy settings from the central config object
+        self.strategy_settings = get_settings().strategy
+        if confidence_threshold is None:
+            confidence_threshold = self.strategy_settings.signal_confidence.threshold
         self.confidence_threshold = confidence_threshold
+        self.logger.info("StrategyAgent initialized with the following settings:")
+        self.logger.info("Timeframes: %s", LazyJson(self.strategy_settings.timeframes))
+        self.logger.info("Volume Confirmation: %s", LazyJson(self.strategy_settings.volume_confirmation))
+        self.logger.info("Risk Management: %s", LazyJson(self.strategy_settings.risk_management))
+
+    def run(self):
+        """
+        The main entry point for the agent's logic.
+
+        For now, it just logs that it's running. In a real implementation, it
+        would analyze market data and generate TradingDecision objects based on
+        the loaded strategy parameters.
+        """
+        self.logger.info("StrategyAgent running...")
+        # Example of accessing a specific parameter:
+        # if self.strategy_settings.volume_confirmation.enabled:
+        #     self.logger.debug("Volume confirmation is enabled.")
+        pass
 
     def analyze(self, snapshot: MarketSnapshot) -> list[TradingDecision]:
         """
@@ -8,6 +8,7 @@ type-safe way to manage application settings.
 Based on the requirements in M4 of NEXT_STEPS_TODO_v2.md.
 """
 import logging
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict
 
@@ -63,21 +64,34 @@ class StrategySettings(BaseModel):
 
 # --- Pydantic-Settings Integration ---
 
-def yaml_config_source(settings: BaseSettings) -> Dict[str, Any]:
+CONFIG_PATH = BASE_DIR / "configs" / "strategy.yaml"
+
+
+@lru_cache(maxsize=1)
+def _load_yaml(path: Path, mtime_ns: int) -> Dict[str, Any]:
     """
-    A pydantic-settings source that loads settings from a YAML file.
+    Reads and parses a YAML file. Cached by modification time, so the file is
+    only parsed again once it has changed.
     """
-    config_path = BASE_DIR / "configs" / "strategy.yaml"
-    if not config_path.is_file():
-        logger.warning(f"YAML config file not found at: {config_path}")
-        return {}
-
     try:
-        with open(config_path, "r") as f:
+        with open(path, "r") as f:
             return yaml.safe_load(f) or {}
     except (IOError, yaml.YAMLError) as e:
-        logger.error(f"Error reading or parsing YAML config: {e}")
+        logger.error("Error reading or parsing YAML config: %s", e)
+        return {}
+
+
+def yaml_config_source() -> Dict[str, Any]:
+    """
+    A pydantic-settings source that loads settings from a YAML file.
+    """
+    try:
+        mtime_ns = CONFIG_PATH.stat().st_mtime_ns
+    except OSError:
+        logger.warning("YAML config file not found at: %s", CONFIG_PATH)
         return {}
+    # Callers may modify the settings built from it, so hand out a copy.
+    return dict(_load_yaml(CONFIG_PATH, mtime_ns))
 
 
 class AppSettings(BaseSettings):
@@ -94,6 +108,8 @@ class AppSettings(BaseSettings):
     telegram_bot_token: str = Field("", env="TELEGRAM_BOT_TOKEN")
     app_env: str = Field("local", env="APP_ENV")
     db_pool_size: int = Field(10, env="DB_POOL_SIZE")
+    # Connections reserved for the KPI and report jobs, apart from db_pool_size.
+    db_reporting_pool_size: int = Field(2, env="DB_REPORTING_POOL_SIZE")
 
     # --- Strategy-specific Settings ---
     strategy: StrategySettings = Field(default_factory=StrategySettings)
@@ -131,8 +147,16 @@ class AppSettings(BaseSettings):
         )
 
 # --- Singleton Instance ---
-# Create a single instance of the settings to be used throughout the application.
-settings = AppSettings()
+@lru_cache(maxsize=1)
+def get_settings() -> AppSettings:
+    """
+    Returns the application settings, loaded on first use.
+
+    Importing this module does not load (or require) any configuration; the
+    single instance is created the first time it is needed.
+    """
+    return AppSettings()
+
 
 # Optional: Log the loaded settings at startup for verification
 if __name__ == "__main__":
@@ -140,4 +164,4 @@ if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
     logger.info("Loaded application settings:")
     # Using model_dump_json for clean, pretty-printed output
-    print(json.dumps(settings.model_dump(), indent=2))
+    print(json.dumps(get_settings().model_dump(), indent=2))
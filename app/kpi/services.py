@@ -7,10 +7,19 @@ from typing import Dict, Any, Optional
 
 import psycopg
 
+from app.log_config import LazyJson
 from app.models import OpsKpiSnapshot
 
 logger = logging.getLogger(__name__)
 
+# These are the transaction types assumed to contribute to realized PnL.
+PNL_TRANSACTION_TYPES = ("REALIZED_PNL", "FEE", "FUNDING")
+
+# The same list as an SQL literal, for `transaction_type IN ...`. The types are
+# inlined rather than bound so that the planner can match the partial index
+# ix_transactions_pnl_ts, including in generic plans of prepared statements.
+PNL_TRANSACTION_TYPES_SQL = "({})".format(", ".join(f"'{t}'" for t in PNL_TRANSACTION_TYPES))
+
 
 def calculate_realized_pnl_for_period(
     db_conn: psycopg.Connection, start_utc: datetime, end_utc: datetime
@@ -29,27 +38,26 @@ def calculate_realized_pnl_for_period(
     Returns:
         The total realized PnL as a float. Returns 0.0 if no transactions found.
     """
-    # These are the transaction types assumed to contribute to realized PnL.
-    pnl_transaction_types = ("REALIZED_PNL", "FEE", "FUNDING")
     try:
         with db_conn.cursor() as cursor:
             cursor.execute(
-                """
+                f"""
                 SELECT COALESCE(SUM(amount), 0.0)
                 FROM transactions
-                WHERE transaction_type = ANY(%s)
+                WHERE transaction_type IN {PNL_TRANSACTION_TYPES_SQL}
                   AND timestamp >= %s
                   AND timestamp < %s
                 """,
-                (list(pnl_transaction_types), start_utc, end_utc),
+                (start_utc, end_utc),
+                prepare=True,
             )
             result = cursor.fetchone()
             pnl = float(result[0]) if result else 0.0
-            logger.debug(f"Calculated PnL for {start_utc} to {end_utc}: {pnl:.2f}")
+            logger.debug("Calculated PnL for %s to %s: %.2f", start_utc, end_utc, pnl)
             return pnl
     except Exception as e:
         logger.exception(
-            f"Error calculating PnL for period {start_utc} to {end_utc}: {e}"
+            "Error calculating PnL for period %s to %s: %s", start_utc, end_utc, e
         )
         return 0.0
 
@@ -104,5 +112,5 @@ def calculate_all_kpis(db_connection: psycopg.Connection) -> OpsKpiSnapshot:
         open_positions_count=3,
     )
 
-    logger.info(f"KPI calculation complete: {snapshot.model_dump_json()}")
+    logger.info("KPI calculation complete: %s", LazyJson(snapshot))
     return snapshot
@@ -6,6 +6,61 @@ Sets up structured (JSON) logging and provides a function to configure it.
 import logging
 import json
 import os
+import re
+
+try:
+    # C-accelerated JSON encoder; the standard library is used without it.
+    import orjson
+except ImportError:
+    orjson = None
+
+class LazyJson:
+    """
+    Defers serializing a pydantic model until a log record is formatted.
+
+    Pass it as a logging argument (``logger.info("x: %s", LazyJson(model))``)
+    so the JSON is never built when the level is filtered out.
+    """
+    __slots__ = ("model",)
+
+    def __init__(self, model):
+        self.model = model
+
+    def __str__(self):
+        return self.model.model_dump_json()
+
+# Names of values that must never appear in the logs.
+SENSITIVE_KEYS = frozenset(("api_key", "secret", "token", "password", "authorization"))
+
+REDACTED = "***REDACTED***"
+
+# A sensitive name (also as part of a longer one, e.g. "telegram_bot_token")
+# followed by its value, as in "api_key=abc", '"token": "abc"' or
+# "Authorization: Bearer abc". Group 1 is kept, group 2 is the value.
+_SENSITIVE_VALUE_RE = re.compile(
+    r"(?i)(\w*(?:%s)\w*[\"']?\s*[:=]\s*[\"']?(?:bearer\s+)?)([^\s\"',;&}]+)"
+    % "|".join(re.escape(key) for key in sorted(SENSITIVE_KEYS))
+)
+
+
+class SensitiveDataFilter(logging.Filter):
+    """
+    Masks the values of sensitive keys (SENSITIVE_KEYS) in log records: in
+    the formatted message, and in attributes passed through `extra`.
+
+    The common case, a message without any sensitive key, costs a single
+    regex scan of the message.
+    """
+    def filter(self, record):
+        message = record.getMessage()
+        masked, count = _SENSITIVE_VALUE_RE.subn(rf"\1{REDACTED}", message)
+        if count:
+            record.msg = masked
+            record.args = None
+        for key in SENSITIVE_KEYS & record.__dict__.keys():
+            setattr(record, key, REDACTED)
+        return True
+
 
 class JsonFormatter(logging.Formatter):
     """
@@ -21,10 +76,9 @@ class JsonFormatter(logging.Formatter):
         if record.exc_info:
             log_record['exc_info'] = self.formatException(record.exc_info)
 
-        # Placeholder for masking sensitive data
-        if 'api_key' in log_record['message']:
-            log_record['message'] = log_record['message'].replace('api_key', '***REDACTED***')
-
+        # Sensitive values are already masked by SensitiveDataFilter.
+        if orjson is not None:
+            return orjson.dumps(log_record).decode()
         return json.dumps(log_record)
 
 def setup_logging():
@@ -47,6 +101,7 @@ def setup_logging():
     # Use the JSON formatter
     formatter = JsonFormatter()
     handler.setFormatter(formatter)
+    handler.addFilter(SensitiveDataFilter())
 
     # Add the handler to the root logger
     logger.addHandler(handler)
@@ -4,59 +4,168 @@ Main entry point for the application.
 This script initializes and runs the scheduler, which in turn triggers the agents.
 """
 import logging
-import time
+import threading
+from datetime import datetime, timezone
 
 import psycopg
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.schedulers.blocking import BlockingScheduler
+from psycopg_pool import ConnectionPool, PoolTimeout
 
 from app.log_config import setup_logging
-from app.config import settings
-# Import the REAL agents, not the skeletons
-from app.agents.execution import ExecutionAgent
-from app.agents.risk import RiskAgent
-# Import the REAL agents, not the skeletons
-from app.agents.kpi import KpiAgent
-from app.agents.report import ReportAgent
+from app.config import get_settings
+from app.agents import ExecutionAgent, KpiAgent, ReportAgent, RiskAgent
 # Skeletons can be used for agents not yet implemented
-from app.agents.skeletons import IngestionAgent, StrategyAgent
+from app.agents.skeletons import IngestionAgent
+from app.agents.strategy import StrategyAgent
 from app.agents.notification import NotifyWorker
+from app.services.system import invalidate_system_configuration_cache
 
 # Configure logging
 setup_logging()
 logger = logging.getLogger(__name__)
 
+def _pooled_job(pool: ConnectionPool, build_agent):
+    """
+    Wraps an agent factory into a scheduler job.
+
+    Each run checks out a connection from the pool for the duration of the
+    agent's work, so agents running concurrently in the scheduler's worker
+    threads no longer share (and serialize on) a single connection.
+    """
+    def job():
+        with pool.connection() as conn:
+            build_agent(conn).run()
+    return job
+
+
+def _rerun_while_dirty(job, dirty: threading.Event):
+    """
+    Wraps a job so that it runs again if `dirty` was set while it ran.
+
+    The scheduler skips a run requested while the job is still running
+    (max_instances=1), so a change signalled mid-run would otherwise wait for
+    the job's next scheduled interval.
+    """
+    def rerun():
+        dirty.clear()
+        job()
+        while dirty.is_set():
+            dirty.clear()
+            job()
+    return rerun
+
+
+# Channel notified by the database when the RiskAgent's inputs change.
+RISK_INPUTS_CHANNEL = "risk_inputs_changed"
+# Channel notified by the database when system_configuration changes.
+SYSTEM_CONFIG_CHANNEL = "system_config_changed"
+
+
+def _listen_for_db_changes(scheduler, stop: threading.Event, risk_inputs_dirty: threading.Event):
+    """
+    Reacts to change notifications sent by the database triggers.
+
+    Runs the risk job immediately whenever positions or candles change (or,
+    if it is already running, once more when it finishes, via
+    `risk_inputs_dirty`), and drops the cached system configuration whenever
+    it is updated.
+
+    Uses a dedicated autocommit connection (outside the pool, as it is held
+    for the lifetime of the process). The risk job's scheduled interval and
+    the configuration cache's TTL remain as fallbacks, e.g. while this
+    connection is being re-established.
+    """
+    while not stop.is_set():
+        try:
+            with psycopg.connect(get_settings().database_url, autocommit=True) as conn:
+                conn.execute(f"LISTEN {RISK_INPUTS_CHANNEL}")
+                conn.execute(f"LISTEN {SYSTEM_CONFIG_CHANNEL}")
+                # Changes may have been missed while disconnected.
+                invalidate_system_configuration_cache()
+                logger.info("Listening for database change notifications.")
+                while not stop.is_set():
+                    # Wake up periodically to check for shutdown.
+                    for notify in conn.notifies(timeout=1.0, stop_after=1):
+                        if notify.channel == SYSTEM_CONFIG_CHANNEL:
+                            logger.info("System configuration changed; invalidating the cache.")
+                            invalidate_system_configuration_cache()
+                        else:
+                            logger.debug("Risk inputs changed (%s); running the risk agent.", notify.payload)
+                            risk_inputs_dirty.set()
+                            scheduler.modify_job("risk_agent", next_run_time=datetime.now(timezone.utc))
+        except psycopg.Error as e:
+            logger.error("Database change listener failed: %s. Reconnecting...", e)
+            stop.wait(5)
+        except Exception:
+            # Anything else must not end this thread either, or the risk job
+            # and the config cache would silently fall back to their timers.
+            logger.exception("Unexpected error in the database change listener. Reconnecting...")
+            stop.wait(5)
+
+
 def main():
     """
     Initializes and starts the agent scheduler.
     """
-    logger.info("Initializing scheduler and database connection...")
+    logger.info("Initializing scheduler and database connection pool...")
+    settings = get_settings()
 
+    pool = ConnectionPool(
+        settings.database_url,
+        min_size=2,
+        max_size=settings.db_pool_size,
+        kwargs={"prepare_threshold": 5},
+        open=True,
+    )
+    # The KPI and report jobs run aggregate queries; their own small pool keeps
+    # them from holding connections the trading agents are waiting for.
+    reporting_pool = ConnectionPool(
+        settings.database_url,
+        min_size=1,
+        max_size=settings.db_reporting_pool_size,
+        kwargs={"prepare_threshold": 5},
+        open=True,
+    )
     try:
-        # Establish database connection
-        # In a real app, a connection pool would be better.
-        db_connection = psycopg.connect(settings.database_url)
-        logger.info("Database connection successful.")
-    except psycopg.OperationalError as e:
-        logger.critical(f"Failed to connect to the database: {e}")
+        pool.wait()
+        reporting_pool.wait()
+        logger.info("Database connection pools ready.")
+    except PoolTimeout as e:
+        logger.critical("Failed to connect to the database: %s", e)
+        pool.close()
+        reporting_pool.close()
         return
 
-    scheduler = BlockingScheduler()
+    # Every pooled job holds one connection while it runs, so the worker
+    # threads are sized to the pools: a job never waits on a connection checkout.
+    scheduler = BlockingScheduler(
+        executors={
+            "default": ThreadPoolExecutor(
+                max_workers=settings.db_pool_size + settings.db_reporting_pool_size
+            )
+        }
+    )
 
-    # Instantiate agents with db connection and dependencies
+    # Agents are built per run around a pooled connection.
     # Note: Using placeholder skeletons for non-implemented agents
-    ingestion_agent = IngestionAgent(symbols=["BTC/USDT"]) # Example symbol
+    ingestion_job = _pooled_job(
+        pool, lambda conn: IngestionAgent(symbols=["BTC/USDT"], db_connection=conn) # Example symbol
+    )
     strategy_agent = StrategyAgent()
 
-    # Instantiate the real, functional agents
-    execution_agent = ExecutionAgent(db_connection=db_connection)
-    risk_agent = RiskAgent(db_connection=db_connection, execution_agent=execution_agent)
-    kpi_agent = KpiAgent(db_connection=db_connection)
-    report_agent = ReportAgent(db_connection=db_connection)
+    # The real, functional agents
+    risk_job = _pooled_job(
+        pool,
+        lambda conn: RiskAgent(db_connection=conn, execution_agent=ExecutionAgent(db_connection=conn)),
+    )
+    kpi_job = _pooled_job(reporting_pool, lambda conn: KpiAgent(db_connection=conn))
+    report_job = _pooled_job(reporting_pool, lambda conn: ReportAgent(db_connection=conn))
 
-    # Instantiate the notification worker
+    # Schedule the notification worker
     if settings.telegram_bot_token:
-        notify_worker = NotifyWorker(db_connection=db_connection)
-        scheduler.add_job(notify_worker.run, 'interval', seconds=5, id='notify_worker')
+        notify_job = _pooled_job(pool, lambda conn: NotifyWorker(db_connection=conn))
+        scheduler.add_job(notify_job, 'interval', seconds=5, id='notify_worker')
         logger.info("Notification worker has been scheduled.")
     else:
         logger.warning("TELEGRAM_BOT_TOKEN not set. Notification worker will not run.")
@@ -66,14 +175,28 @@ def main():
     # Note: The `execution_agent.run` expects a `TradingDecision`, so scheduling it
     # to run on an interval like this is not correct. It should be triggered.
     # We will leave it commented out as per the original design.
-    scheduler.add_job(ingestion_agent.run, 'interval', seconds=60, id='ingestion_agent')
+    scheduler.add_job(ingestion_job, 'interval', seconds=60, id='ingestion_agent')
     scheduler.add_job(strategy_agent.run, 'interval', seconds=60, id='strategy_agent')
     # scheduler.add_job(execution_agent.run, 'interval', seconds=20, id='execution_agent')
-    scheduler.add_job(risk_agent.run, 'interval', seconds=30, id='risk_agent')
+    # The risk agent is woken by database notifications when its inputs change.
+    # Notifications that arrive while it runs mark its inputs dirty, and it runs
+    # again as soon as it finishes. The listener has no liveness signal yet, so
+    # the interval stays short enough to be a real fallback.
+    risk_inputs_dirty = threading.Event()
+    scheduler.add_job(
+        _rerun_while_dirty(risk_job, risk_inputs_dirty), 'interval', seconds=30, id='risk_agent', coalesce=True
+    )
+    stop_listener = threading.Event()
+    threading.Thread(
+        target=_listen_for_db_changes,
+        args=(scheduler, stop_listener, risk_inputs_dirty),
+        name="db-listener",
+        daemon=True,
+    ).start()
 
     # Schedule the new KPI and Report agents
-    scheduler.add_job(kpi_agent.run, 'interval', minutes=5, id='kpi_agent')
-    scheduler.add_job(report_agent.run, 'interval', hours=1, id='report_agent')
+    scheduler.add_job(kpi_job, 'interval', minutes=5, id='kpi_agent')
+    scheduler.add_job(report_job, 'interval', hours=1, id='report_agent')
 
     try:
         logger.info("Scheduler started. Press Ctrl+C to exit.")
@@ -81,6 +204,10 @@ def main():
     except (KeyboardInterrupt, SystemExit):
         logger.info("Scheduler stopped.")
         scheduler.shutdown()
+    finally:
+        stop_listener.set()
+        pool.close()
+        reporting_pool.close()
 
 if __name__ == "__main__":
     main()
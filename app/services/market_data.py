@@ -0,0 +1,44 @@
+"""
+In-process snapshot of the latest market prices.
+
+The IngestionAgent records the latest close of every symbol it fetches, and
+the RiskAgent reads it before falling back to the `candles` table, so a risk
+cycle that runs shortly after ingestion needs no database query for prices.
+Both agents run in the scheduler's process.
+"""
+import time
+from typing import Optional
+
+# Ingestion runs every minute; allow for one late run before a price is stale.
+DEFAULT_MAX_AGE_SECONDS = 90.0
+
+
+class PriceSnapshot:
+    """
+    Latest price per generic symbol (e.g., 'BTC/USDT'), with the monotonic
+    time it was recorded.
+
+    Each entry is replaced as a whole by a single dict assignment, which is
+    atomic under the GIL, so readers in other threads need no lock.
+    """
+
+    def __init__(self):
+        self._prices: dict[str, tuple[float, float]] = {}
+
+    def update(self, symbol: str, price: float):
+        """Records the latest price for a symbol."""
+        self._prices[symbol] = (price, time.monotonic())
+
+    def get(self, symbol: str, max_age: float = DEFAULT_MAX_AGE_SECONDS) -> Optional[float]:
+        """Returns the latest price for a symbol, or None if unknown or older than `max_age` seconds."""
+        entry = self._prices.get(symbol)
+        if entry is None:
+            return None
+        price, recorded_at = entry
+        if time.monotonic() - recorded_at > max_age:
+            return None
+        return price
+
+
+# Shared by the agents running in this process.
+price_snapshot = PriceSnapshot()
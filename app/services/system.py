@@ -6,7 +6,9 @@ table in the database, which stores dynamic settings like the global
 kill switch and loss limits.
 """
 import logging
-from datetime import datetime, timedelta
+import threading
+import time
+from datetime import datetime
 from typing import Optional
 
 import psycopg
@@ -17,21 +19,68 @@ logger = logging.getLogger(__name__)
 
 # --- In-memory Cache ---
 _config_cache: Optional[SystemConfiguration] = None
-_cache_expiry: Optional[datetime] = None
-CACHE_TTL_SECONDS = 15
+# time.monotonic() deadline after which the cached configuration is refreshed.
+_cache_expires_at: float = 0.0
+# The scheduler invalidates the cache whenever the database notifies it of a
+# change (see invalidate_system_configuration_cache), so the TTL only bounds
+# staleness while that notification listener is reconnecting.
+CACHE_TTL_SECONDS = 300
+# Held by the one caller that refreshes an expired cache; the others keep
+# serving the stale configuration instead of issuing the same query.
+_refresh_lock = threading.Lock()
+# Bumped by every invalidation. A configuration is only cached if no
+# invalidation happened since its read began, so a read that raced with a
+# change can't put the old row back into the cache.
+_cache_generation: int = 0
+# Makes the generation check and the cache update one atomic step.
+_cache_lock = threading.Lock()
+
+
+def system_config_cache_generation() -> int:
+    """
+    Returns the current cache generation. Take it before reading the
+    configuration and pass it to `cache_system_configuration` along with it.
+    """
+    return _cache_generation
+
+
+def _store_in_cache(config: SystemConfiguration, generation: int) -> bool:
+    """Caches the configuration unless the cache was invalidated since `generation`."""
+    global _config_cache, _cache_expires_at
+    with _cache_lock:
+        if generation != _cache_generation:
+            return False
+        _config_cache = config
+        _cache_expires_at = time.monotonic() + CACHE_TTL_SECONDS
+        return True
+
 
 def get_system_configuration(db_conn: psycopg.Connection) -> Optional[SystemConfiguration]:
     """
     Fetches the system configuration from the database.
 
     Uses a simple in-memory cache to avoid frequent DB queries. The cache
-    invalidates after CACHE_TTL_SECONDS.
+    invalidates after CACHE_TTL_SECONDS. Only one caller at a time refreshes
+    an expired cache; concurrent callers get the stale configuration rather
+    than querying too, and only wait when there is nothing cached yet.
     """
-    global _config_cache, _cache_expiry
+    config = _config_cache
+    if config is not None and time.monotonic() < _cache_expires_at:
+        return config
+
+    if not _refresh_lock.acquire(blocking=config is None):
+        return config
+    try:
+        # Another caller may have refreshed the cache while we were waiting.
+        if _config_cache is not None and time.monotonic() < _cache_expires_at:
+            return _config_cache
+        return _fetch_system_configuration(db_conn)
+    finally:
+        _refresh_lock.release()
 
-    if _config_cache and _cache_expiry and datetime.utcnow() < _cache_expiry:
-        return _config_cache
 
+def _fetch_system_configuration(db_conn: psycopg.Connection) -> Optional[SystemConfiguration]:
+    generation = _cache_generation
     try:
         with db_conn.cursor() as cursor:
             cursor.execute(
@@ -46,22 +95,50 @@ def get_system_configuration(db_conn: psycopg.Connection) -> Optional[SystemConf
                     weekly_loss_limit_usd=float(row[3]),
                     updated_at=row[4],
                 )
-                _config_cache = config
-                _cache_expiry = datetime.utcnow() + timedelta(seconds=CACHE_TTL_SECONDS)
-                logger.info("System configuration cache refreshed.")
+                if _store_in_cache(config, generation):
+                    logger.info("System configuration cache refreshed.")
+                else:
+                    logger.info("System configuration changed while it was read; not caching it.")
                 return config
             else:
                 logger.error("System configuration not found in the database (id=1).")
                 return None
     except Exception as e:
-        logger.exception(f"Error fetching system configuration: {e}")
+        logger.exception("Error fetching system configuration: %s", e)
         return None
 
+def invalidate_system_configuration_cache() -> None:
+    """
+    Drops the cached configuration, so the next `get_system_configuration`
+    call reads it from the database again.
+    """
+    global _config_cache, _cache_expires_at, _cache_generation
+    with _cache_lock:
+        _cache_generation += 1
+        _config_cache = None
+        _cache_expires_at = 0.0
+
+def cache_system_configuration(config: SystemConfiguration, generation: int) -> bool:
+    """
+    Stores a configuration that was read from the database by other means
+    (e.g., as part of a larger query) in the in-memory cache, so subsequent
+    `get_system_configuration` calls within the TTL don't query it again.
+
+    Args:
+        config: The configuration that was read.
+        generation: The `system_config_cache_generation()` taken before the read.
+            If the cache was invalidated since, the configuration may be stale
+            and is not stored.
+
+    Returns:
+        True if the configuration was cached.
+    """
+    return _store_in_cache(config, generation)
+
 def set_trading_enabled(db_conn: psycopg.Connection, status: bool) -> bool:
     """
     Updates the trading status (kill switch) in the database.
     """
-    global _config_cache, _cache_expiry
     try:
         with db_conn.cursor() as cursor:
             cursor.execute(
@@ -70,13 +147,10 @@ def set_trading_enabled(db_conn: psycopg.Connection, status: bool) -> bool:
             )
             db_conn.commit()
             # Invalidate the cache immediately
-            _config_cache = None
-            _cache_expiry = None
-            logger.warning(
-                f"Trading has been globally {'ENABLED' if status else 'DISABLED'}."
-            )
+            invalidate_system_configuration_cache()
+            logger.warning("Trading has been globally %s.", "ENABLED" if status else "DISABLED")
             return True
     except Exception as e:
-        logger.exception(f"Failed to set trading status to {status}: {e}")
+        logger.exception("Failed to set trading status to %s: %s", status, e)
         db_conn.rollback()
         return False
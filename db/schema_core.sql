@@ -96,6 +96,12 @@ CREATE TABLE IF NOT EXISTS transactions (
     timestamp TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
+-- Realized PnL (and the RiskAgent's loss limits) sums these transaction types
+-- over a time range. The list must match PNL_TRANSACTION_TYPES in
+-- app/kpi/services.py, whose queries inline it so this index applies.
+CREATE INDEX IF NOT EXISTS ix_transactions_pnl_ts ON transactions (timestamp) INCLUDE (amount)
+    WHERE transaction_type IN ('REALIZED_PNL', 'FEE', 'FUNDING');
+
 CREATE TABLE IF NOT EXISTS positions (
     id SERIAL PRIMARY KEY,
     account_id INT NOT NULL REFERENCES accounts(id),
@@ -107,6 +113,45 @@ CREATE TABLE IF NOT EXISTS positions (
     UNIQUE(account_id, exchange_instrument_id)
 );
 
+-- Open positions with their exchange symbol, as read by the RiskAgent every
+-- cycle. Closed positions keep a row with quantity 0, so the partial index
+-- lets the per-account lookup skip them.
+CREATE INDEX IF NOT EXISTS ix_positions_account_open ON positions (account_id) WHERE quantity != 0;
+
+CREATE OR REPLACE VIEW active_positions_v AS
+SELECT p.id, p.account_id, p.exchange_instrument_id, ei.exchange_symbol,
+       p.quantity, p.average_entry_price, p.initial_stop_loss,
+       COALESCE(i.symbol, ei.exchange_symbol) AS symbol
+FROM positions p
+JOIN exchange_instruments ei ON p.exchange_instrument_id = ei.id
+LEFT JOIN instruments i ON ei.instrument_id = i.id
+WHERE p.quantity != 0;
+
+-- Risk rules already executed for a position, so the RiskAgent fires each
+-- rule at most once per position rather than on every cycle.
+CREATE TABLE IF NOT EXISTS position_rule_triggers (
+    position_id INT NOT NULL REFERENCES positions(id) ON DELETE CASCADE,
+    rule_name TEXT NOT NULL,
+    triggered_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (position_id, rule_name)
+);
+
+
+-- Section: Market Data (M3)
+-- 1m OHLCV candles written by the IngestionAgent. Prices are stored as
+-- DOUBLE PRECISION so the agent can bulk-load them with binary COPY.
+CREATE TABLE IF NOT EXISTS candles (
+    symbol VARCHAR(20) NOT NULL,
+    timeframe VARCHAR(10) NOT NULL,
+    timestamp TIMESTAMPTZ NOT NULL,
+    open DOUBLE PRECISION NOT NULL,
+    high DOUBLE PRECISION NOT NULL,
+    low DOUBLE PRECISION NOT NULL,
+    close DOUBLE PRECISION NOT NULL,
+    volume DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (symbol, timeframe, timestamp)
+);
+
 
 -- Section 4.1: Order/Execution Core Integrity (from original design)
 -- Note: The ALTER TABLE is no longer needed as the column is in CREATE TABLE.
@@ -150,6 +195,36 @@ CREATE TRIGGER tr_orders_normalize
   FOR EACH ROW EXECUTE FUNCTION trg_orders_normalize();
 
 
+-- Section: Risk Input Change Notifications
+-- Signals the scheduler (LISTEN risk_inputs_changed) to re-run the RiskAgent
+-- as soon as positions change or new candles arrive, instead of waiting for
+-- its next polling interval. Statement-level, so a bulk load sends a single
+-- notification; Postgres also folds identical notifications per transaction.
+CREATE OR REPLACE FUNCTION trg_notify_risk_inputs_changed()
+RETURNS trigger AS $$
+BEGIN
+  IF TG_TABLE_NAME = 'candles' THEN
+    -- Candle loads skip duplicates, so only signal when rows were actually added.
+    IF NOT EXISTS (SELECT 1 FROM new_rows) THEN
+      RETURN NULL;
+    END IF;
+  END IF;
+  PERFORM pg_notify('risk_inputs_changed', TG_TABLE_NAME);
+  RETURN NULL;
+END; $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tr_positions_notify_risk ON positions;
+CREATE TRIGGER tr_positions_notify_risk
+  AFTER INSERT OR UPDATE OR DELETE ON positions
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_notify_risk_inputs_changed();
+
+DROP TRIGGER IF EXISTS tr_candles_notify_risk ON candles;
+CREATE TRIGGER tr_candles_notify_risk
+  AFTER INSERT ON candles
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION trg_notify_risk_inputs_changed();
+
+
 -- Section 4.3: Telegram Integration (from original design)
 DO $$
 BEGIN
@@ -221,6 +296,20 @@ CREATE TABLE IF NOT EXISTS ops_kpi_snapshots (
   open_positions_count INT
 );
 
+-- Covers the ReportAgent's "latest snapshot" query so it is answered by an
+-- index-only scan of the newest entry.
+CREATE INDEX IF NOT EXISTS ix_ops_kpi_snapshots_ts_desc ON ops_kpi_snapshots (ts DESC)
+  INCLUDE (order_latency_p50_ms, order_latency_p95_ms, order_failure_rate, order_retry_rate,
+           position_gross_exposure_usd, open_positions_count);
+
+-- Hash of the last report enqueued per chat, so the ReportAgent can skip
+-- re-sending a report whose content has not changed.
+CREATE TABLE IF NOT EXISTS report_state (
+  chat_id BIGINT PRIMARY KEY,
+  last_hash BYTEA NOT NULL,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
 
 -- Section: System-wide Configuration for Guardrails (M10)
 CREATE TABLE IF NOT EXISTS system_configuration (
@@ -233,3 +322,18 @@ CREATE TABLE IF NOT EXISTS system_configuration (
 
 -- Insert the default singleton configuration row if it doesn't exist.
 INSERT INTO system_configuration (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+
+-- Signals the scheduler (LISTEN system_config_changed) to drop its cached
+-- copy of the configuration, so a kill switch flipped from outside the
+-- process takes effect immediately rather than after the cache TTL.
+CREATE OR REPLACE FUNCTION trg_notify_system_config_changed()
+RETURNS trigger AS $$
+BEGIN
+  PERFORM pg_notify('system_config_changed', NEW.id::text);
+  RETURN NULL;
+END; $$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tr_system_configuration_notify ON system_configuration;
+CREATE TRIGGER tr_system_configuration_notify
+  AFTER INSERT OR UPDATE ON system_configuration
+  FOR EACH ROW EXECUTE FUNCTION trg_notify_system_config_changed();
@@ -13,13 +13,21 @@ CREATE TABLE IF NOT EXISTS inbound_dedupe_keys (
   processed BOOLEAN NOT NULL DEFAULT FALSE
 );
 
+-- Returns TRUE the first time a key is seen, so a receiver can drop duplicates
+-- with this one statement, before doing any other work for them.
+DROP FUNCTION IF EXISTS mark_idem_seen(text, text, text);
 CREATE OR REPLACE FUNCTION mark_idem_seen(p_key text, p_hash text, p_src text)
-RETURNS VOID LANGUAGE plpgsql AS $$
+RETURNS BOOLEAN LANGUAGE plpgsql AS $$
+DECLARE
+  v_first_seen BOOLEAN;
 BEGIN
   INSERT INTO inbound_dedupe_keys(idempotency_key, payload_hash, source)
   VALUES (p_key, p_hash, p_src)
   ON CONFLICT (idempotency_key) DO
-    UPDATE SET last_seen_at = NOW();
+    UPDATE SET last_seen_at = NOW()
+  -- xmax is 0 for a freshly inserted row version, set for an updated one.
+  RETURNING (xmax = 0) INTO v_first_seen;
+  RETURN v_first_seen;
 END $$;
 
 
@@ -0,0 +1,68 @@
+"""
+Shared fixtures for the DB integrity tests.
+
+A single PostgreSQL container serves the whole test session. The schemas are
+applied once, to a template database, and each test module gets its own copy
+of it via `CREATE DATABASE ... TEMPLATE`, which is much faster than starting
+a container and loading the schemas per module.
+"""
+from pathlib import Path
+
+import psycopg
+import pytest
+from psycopg import sql
+from psycopg.conninfo import make_conninfo
+from testcontainers.postgres import PostgresContainer
+
+SQL_DIR = Path(__file__).parent.parent.parent / "db"
+# Read once, as bytes, which psycopg sends without re-encoding.
+CORE_SCHEMA_BYTES = (SQL_DIR / "schema_core.sql").read_bytes()
+PLUS_SCHEMA_BYTES = (SQL_DIR / "schema_plus_options.sql").read_bytes()
+TEMPLATE_DB = "tmpl"
+
+
+@pytest.fixture(scope="session")
+def postgres_container():
+    """Manages a PostgreSQL container for the whole test session."""
+    # The driver=None is crucial for psycopg3 compatibility
+    with PostgresContainer("postgres:16-alpine", driver=None) as container:
+        yield container
+
+
+@pytest.fixture(scope="session")
+def template_db(postgres_container):
+    """
+    Creates a template database with the core and plus schemas applied, and
+    returns its name.
+    """
+    server_url = postgres_container.get_connection_url()
+    with psycopg.connect(server_url, autocommit=True) as conn:
+        conn.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(TEMPLATE_DB)))
+
+    with psycopg.connect(make_conninfo(server_url, dbname=TEMPLATE_DB)) as conn:
+        conn.execute(CORE_SCHEMA_BYTES)
+        conn.execute(PLUS_SCHEMA_BYTES)
+        conn.commit()
+
+    # Cloning requires that nobody is connected to the template, so this
+    # runs after the connection above is closed.
+    with psycopg.connect(server_url, autocommit=True) as conn:
+        conn.execute(sql.SQL("ALTER DATABASE {} IS_TEMPLATE = true").format(sql.Identifier(TEMPLATE_DB)))
+    return TEMPLATE_DB
+
+
+@pytest.fixture(scope="module")
+def module_db_url(request, postgres_container, template_db):
+    """
+    Creates a database for the test module as a copy of the template, and
+    yields its connection string.
+    """
+    server_url = postgres_container.get_connection_url()
+    db_name = f"test_{request.module.__name__.rpartition('.')[2]}"
+    with psycopg.connect(server_url, autocommit=True) as conn:
+        conn.execute(
+            sql.SQL("CREATE DATABASE {} TEMPLATE {}").format(
+                sql.Identifier(db_name), sql.Identifier(template_db)
+            )
+        )
+    yield make_conninfo(server_url, dbname=db_name)
@@ -1,45 +1,34 @@
 import pytest
 import psycopg
-from testcontainers.postgres import PostgresContainer
-from pathlib import Path
 import json
 
-# Define a fixture to manage the PostgreSQL container lifecycle.
-# The 'scope="module"' ensures the container starts only once for all tests in this file.
+# The module's database is a copy of a template with both the core and plus
+# schemas applied (see tests/db/conftest.py); this fixture only seeds it.
 @pytest.fixture(scope="module")
-def postgres_db_url():
+def postgres_db_url(module_db_url):
     """
-    Spins up a PostgreSQL container, applies both core and plus schemas,
-    and yields the connection URL. The container is torn down automatically.
+    Seeds the module's test DB with prerequisite data and yields its
+    connection URL.
     """
-    # Locate schema files relative to this test file's location.
-    sql_dir = Path(__file__).parent.parent.parent / "db"
-    core_schema_path = sql_dir / "schema_core.sql"
-    plus_schema_path = sql_dir / "schema_plus_options.sql"
-
-    # The driver=None is crucial for psycopg3 compatibility
-    with PostgresContainer("postgres:16-alpine", driver=None) as postgres:
-        db_url = postgres.get_connection_url()
-        with psycopg.connect(db_url) as conn:
-            with conn.cursor() as cur:
-                # Apply schemas
-                cur.execute(core_schema_path.read_text())
-                cur.execute(plus_schema_path.read_text())
-
-                # Seed database with prerequisite data to satisfy foreign key constraints
-                cur.execute("INSERT INTO users (username) VALUES ('test_user') RETURNING id;")
-                user_id = cur.fetchone()[0]
-                cur.execute("INSERT INTO accounts (user_id, name) VALUES (%s, 'test_account');", (user_id,))
-                cur.execute("INSERT INTO exchanges (name) VALUES ('test_exchange') RETURNING id;")
-                exchange_id = cur.fetchone()[0]
-                cur.execute("INSERT INTO instruments (symbol) VALUES ('TEST/USD') RETURNING id;")
-                instrument_id = cur.fetchone()[0]
-                cur.execute(
-                    "INSERT INTO exchange_instruments (exchange_id, instrument_id, exchange_symbol) VALUES (%s, %s, 'TESTUSD') RETURNING id;",
-                    (exchange_id, instrument_id)
+    with psycopg.connect(module_db_url) as conn:
+        with conn.cursor() as cur:
+            # Seed database with prerequisite data to satisfy foreign key constraints,
+            # in one round-trip.
+            cur.execute("""
+                WITH u AS (
+                    INSERT INTO users (username) VALUES ('test_user') RETURNING id
+                ), a AS (
+                    INSERT INTO accounts (user_id, name) SELECT id, 'test_account' FROM u
+                ), e AS (
+                    INSERT INTO exchanges (name) VALUES ('test_exchange') RETURNING id
+                ), i AS (
+                    INSERT INTO instruments (symbol) VALUES ('TEST/USD') RETURNING id
                 )
-                conn.commit()
-        yield db_url
+                INSERT INTO exchange_instruments (exchange_id, instrument_id, exchange_symbol)
+                SELECT e.id, i.id, 'TESTUSD' FROM e, i;
+            """)
+            conn.commit()
+    yield module_db_url
 
 def test_inbound_dedupe_and_function(postgres_db_url):
     """Verify the inbound_dedupe_keys table and mark_idem_seen function."""
@@ -51,6 +40,7 @@ def test_inbound_dedupe_and_function(postgres_db_url):
 
             # 1. Call the function to insert a key
             cur.execute("SELECT mark_idem_seen(%s, %s, %s);", (idem_key, payload_hash, source))
+            assert cur.fetchone()[0] is True, "A new key should be reported as first seen."
             conn.commit()
 
             # 2. Verify the key was inserted correctly
@@ -62,6 +52,7 @@ def test_inbound_dedupe_and_function(postgres_db_url):
 
             # 3. Verify the ON CONFLICT DO UPDATE part of the function
             cur.execute("SELECT mark_idem_seen(%s, %s, %s);", (idem_key, "new_hash", source))
+            assert cur.fetchone()[0] is False, "A known key should be reported as a duplicate."
             cur.execute("SELECT count(*) FROM inbound_dedupe_keys WHERE idempotency_key = %s;", (idem_key,))
             count = cur.fetchone()[0]
             assert count == 1, "Duplicate key was inserted instead of updated."
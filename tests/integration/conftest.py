@@ -9,8 +9,7 @@ def clear_system_cache_before_test():
     """
     try:
         from app.services import system
-        system._config_cache = None
-        system._cache_expiry = None
+        system.invalidate_system_configuration_cache()
     except (ImportError, AttributeError):
         # If the module or variables don't exist for some reason, there's nothing to clear.
         pass
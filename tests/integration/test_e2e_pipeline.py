@@ -11,7 +11,7 @@ from decimal import Decimal
 from testcontainers.postgres import PostgresContainer
 
 from app.agents.execution import ExecutionAgent
-from app.agents.risk import RiskAgent
+from app.agents.risk import RiskAgent, RiskRule
 from app.models import TradingDecision, TradeSide
 
 # Set up logging for tests
@@ -233,7 +233,7 @@ def test_full_pipeline_from_signal_to_risk_and_notification(e2e_db_session, capl
     profitable_price = 72500.0
 
     # --- Act: Run the risk agent with the mocked price ---
-    with patch.object(risk_agent, '_get_current_market_price', return_value=profitable_price):
+    with patch.object(risk_agent, '_get_current_market_prices', return_value={"BTCUSD": profitable_price}):
         risk_agent.run()
 
     # --- Assert: Verify that a new closing order was created ---
@@ -308,14 +308,12 @@ def test_full_pipeline_sell_order_with_stop_loss(e2e_db_session, caplog):
     # Price moves against the short position, above the stop loss
     stop_loss_trigger_price = 61500.0
 
-    # The RiskAgent's _evaluate_position_risk has its own R-multiple calculation.
+    # The RiskAgent's _evaluate_positions has its own R-multiple calculation.
     # We will mock the price and let the agent's logic run.
     # The agent should identify this as R < -1.0
-    with patch.object(risk_agent, '_get_current_market_price', return_value=stop_loss_trigger_price):
+    with patch.object(risk_agent, '_get_current_market_prices', return_value={"BTCUSD": stop_loss_trigger_price}):
         # We need to add a stop-loss rule to the agent for this test
-        risk_agent.risk_rules.append(
-            {"name": "stop_loss", "profit_r": -1.0, "action": "close_full"}
-        )
+        risk_agent.add_risk_rule(RiskRule("stop_loss", -1.0, "close_full"))
         # We also need to mock the _execute_risk_action to handle "close_full"
         with patch.object(risk_agent, '_execute_risk_action') as mock_execute_action:
             risk_agent.run()
@@ -328,5 +326,5 @@ def test_full_pipeline_sell_order_with_stop_loss(e2e_db_session, caplog):
     # We can inspect the call arguments to be more specific
     call_args, _ = mock_execute_action.call_args
     triggered_rule = call_args[1]
-    assert triggered_rule["name"] == "stop_loss"
+    assert triggered_rule.name == "stop_loss"
     logger.info("SUCCESS: Stop-loss rule was correctly triggered.")
@@ -0,0 +1,58 @@
+from app.agents.execution import ExecutionAgent
+from app.models import TradingDecision, TradeSide
+
+
+def make_decision(**overrides) -> TradingDecision:
+    params = dict(symbol="BTC/USDT", side=TradeSide.BUY, sl=60000.0, tp=70000.0, confidence=0.9)
+    params.update(overrides)
+    return TradingDecision(**params)
+
+
+def test_idempotency_key_is_deterministic_within_a_minute():
+    """
+    Tests that the same decision yields the same key, and that the key is a
+    fixed-length SHA256 hex digest.
+    """
+    agent = ExecutionAgent(db_connection=None, account_id=1)
+    key = agent._generate_idempotency_key(make_decision())
+
+    assert key == agent._generate_idempotency_key(make_decision())
+    assert len(key) == 64
+
+
+def test_idempotency_key_depends_on_decision_and_account():
+    """
+    Tests that any change in the decision's identifying fields, or in the
+    account, produces a different key.
+    """
+    agent = ExecutionAgent(db_connection=None, account_id=1)
+    base_key = agent._generate_idempotency_key(make_decision())
+
+    assert agent._generate_idempotency_key(make_decision(symbol="ETH/USDT")) != base_key
+    assert agent._generate_idempotency_key(make_decision(side=TradeSide.SELL)) != base_key
+    assert agent._generate_idempotency_key(make_decision(sl=59000.0)) != base_key
+    assert agent._generate_idempotency_key(make_decision(tp=71000.0)) != base_key
+
+    other_account = ExecutionAgent(db_connection=None, account_id=2)
+    assert other_account._generate_idempotency_key(make_decision()) != base_key
+
+
+def test_idempotency_key_does_not_depend_on_previous_keys():
+    """
+    Tests that the shared prefix hash state is copied, not mutated, so a key
+    is the same regardless of which keys were generated before it.
+    """
+    agent = ExecutionAgent(db_connection=None, account_id=1)
+    agent._generate_idempotency_key(make_decision(symbol="ETH/USDT"))
+    key = agent._generate_idempotency_key(make_decision())
+
+    assert key == ExecutionAgent(db_connection=None, account_id=1)._generate_idempotency_key(make_decision())
+
+
+def test_run_many_with_no_decisions_does_not_touch_the_database():
+    """
+    Tests that an empty batch short-circuits before any database access.
+    """
+    agent = ExecutionAgent(db_connection=None, account_id=1)
+
+    assert agent.run_many([]) == []
@@ -0,0 +1,35 @@
+import logging
+
+import pytest
+from app.log_config import REDACTED, SensitiveDataFilter
+
+
+def _record(msg, *args, **extra):
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+@pytest.mark.parametrize(
+    "message, expected",
+    [
+        ("api_key=abc123 sent", f"api_key={REDACTED} sent"),
+        ('{"token": "abc123"}', f'{{"token": "{REDACTED}"}}'),
+        ("Authorization: Bearer abc123", f"Authorization: Bearer {REDACTED}"),
+        ("TELEGRAM_BOT_TOKEN=123:abc", f"TELEGRAM_BOT_TOKEN={REDACTED}"),
+        ("Loaded 3 tokens for BTC/USDT", "Loaded 3 tokens for BTC/USDT"),
+    ],
+)
+def test_sensitive_values_are_masked_in_messages(message, expected):
+    record = _record(message)
+    assert SensitiveDataFilter().filter(record)
+    assert record.getMessage() == expected
+
+
+def test_sensitive_values_are_masked_in_args_and_extras():
+    record = _record("Connecting with password=%s", "hunter2", api_key="abc123", symbol="BTC/USDT")
+    SensitiveDataFilter().filter(record)
+
+    assert record.getMessage() == f"Connecting with password={REDACTED}"
+    assert record.api_key == REDACTED
+    assert record.symbol == "BTC/USDT"
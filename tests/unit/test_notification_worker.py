@@ -0,0 +1,41 @@
+import logging
+from datetime import datetime, timezone
+
+from app.agents.notification import NotifyWorker
+
+
+class FakeCursor:
+    def __init__(self, row):
+        self.row = row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def fetchone(self):
+        return self.row
+
+
+def make_worker() -> NotifyWorker:
+    # The failure logging needs no Telegram bot.
+    return NotifyWorker.__new__(NotifyWorker)
+
+
+def test_failure_at_max_retries_is_logged_as_warning(caplog):
+    with caplog.at_level(logging.INFO, logger="app.agents.notification"):
+        make_worker()._log_failure(FakeCursor(("FAILED", None)), 7)
+
+    assert [r.levelno for r in caplog.records] == [logging.WARNING]
+    assert "has reached max retries" in caplog.text
+
+
+def test_failure_before_max_retries_logs_the_retry_time(caplog):
+    send_after = datetime(2024, 1, 1, 12, 0, tzinfo=timezone.utc)
+
+    with caplog.at_level(logging.INFO, logger="app.agents.notification"):
+        make_worker()._log_failure(FakeCursor(("PENDING", send_after)), 7)
+
+    assert [r.levelno for r in caplog.records] == [logging.INFO]
+    assert f"Retrying after {send_after}" in caplog.text
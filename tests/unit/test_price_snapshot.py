@@ -0,0 +1,22 @@
+from app.services import market_data
+from app.services.market_data import PriceSnapshot
+
+
+def test_get_returns_latest_price():
+    snapshot = PriceSnapshot()
+    snapshot.update("BTC/USDT", 100.0)
+    snapshot.update("BTC/USDT", 101.5)
+
+    assert snapshot.get("BTC/USDT") == 101.5
+    assert snapshot.get("ETH/USDT") is None
+
+
+def test_get_ignores_stale_price(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(market_data.time, "monotonic", lambda: now)
+    snapshot = PriceSnapshot()
+    snapshot.update("BTC/USDT", 100.0)
+
+    now += 10
+    assert snapshot.get("BTC/USDT", max_age=30) == 100.0
+    assert snapshot.get("BTC/USDT", max_age=5) is None
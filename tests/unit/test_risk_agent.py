@@ -1,5 +1,8 @@
+import math
+
+import numpy as np
 import pytest
-from app.agents.risk import calculate_r_multiple
+from app.agents.risk import calculate_r_multiple, calculate_r_multiples
 from app.models import TradeSide
 
 @pytest.mark.parametrize(
@@ -44,3 +47,29 @@ def test_calculate_r_multiple_zero_risk():
         side=TradeSide.BUY,
     )
     assert r_multiple is None
+
+def test_calculate_r_multiples_matches_scalar_version():
+    """
+    Tests that the vectorized R-multiple calculation agrees with the scalar
+    function for a mix of long and short positions, including zero risk.
+    """
+    cases = [
+        (100, 110, 90, TradeSide.BUY),
+        (100, 95, 90, TradeSide.BUY),
+        (100, 75, 110, TradeSide.SELL),
+        (100, 110, 110, TradeSide.SELL),
+        (100, 110, 100, TradeSide.BUY),  # Zero risk
+    ]
+    r_multiples = calculate_r_multiples(
+        np.array([c[0] for c in cases], dtype=float),
+        np.array([c[1] for c in cases], dtype=float),
+        np.array([c[2] for c in cases], dtype=float),
+        np.array([c[3] == TradeSide.BUY for c in cases]),
+    )
+
+    for (entry, current, sl, side), r_multiple in zip(cases, r_multiples):
+        expected = calculate_r_multiple(float(entry), float(current), float(sl), side)
+        if expected is None:
+            assert math.isnan(r_multiple)
+        else:
+            assert r_multiple == pytest.approx(expected)
@@ -0,0 +1,82 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.models import SystemConfiguration
+from app.services import system
+
+
+class FailingConnection:
+    def cursor(self):
+        raise AssertionError("the database should not be queried")
+
+
+class InvalidatingCursor:
+    """Returns a config row, with the cache invalidated while the query runs."""
+
+    def __init__(self, row):
+        self.row = row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        system.invalidate_system_configuration_cache()
+
+    def fetchone(self):
+        return self.row
+
+
+class InvalidatingConnection:
+    def __init__(self, row):
+        self.row = row
+
+    def cursor(self):
+        return InvalidatingCursor(self.row)
+
+
+@pytest.fixture
+def config():
+    system.invalidate_system_configuration_cache()
+    yield SystemConfiguration(
+        id=1,
+        is_trading_enabled=True,
+        daily_loss_limit_usd=1000.0,
+        weekly_loss_limit_usd=5000.0,
+        updated_at=datetime.now(timezone.utc),
+    )
+    system.invalidate_system_configuration_cache()
+
+
+def test_fresh_cache_is_served_without_query(config):
+    system.cache_system_configuration(config, system.system_config_cache_generation())
+
+    assert system.get_system_configuration(FailingConnection()) is config
+
+
+def test_expired_cache_is_served_while_another_caller_refreshes(config):
+    system.cache_system_configuration(config, system.system_config_cache_generation())
+    system._cache_expires_at = 0.0
+
+    with system._refresh_lock:
+        assert system.get_system_configuration(FailingConnection()) is config
+
+
+def test_config_read_before_invalidation_is_not_cached(config):
+    generation = system.system_config_cache_generation()
+    system.invalidate_system_configuration_cache()
+
+    assert system.cache_system_configuration(config, generation) is False
+    assert system._config_cache is None
+
+
+def test_refresh_interleaved_with_invalidation_is_not_cached(config):
+    row = (1, True, 1000.0, 5000.0, config.updated_at)
+
+    fetched = system.get_system_configuration(InvalidatingConnection(row))
+
+    assert fetched.is_trading_enabled is True
+    assert system._config_cache is None